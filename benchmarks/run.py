@@ -0,0 +1,393 @@
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+
+# Frames are rendered without a window
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import numpy as np
+import pygame
+
+from engine.geometry import Camera, Mesh, Point3D, ShapeFactory
+from engine.renderer import STF, Renderer, Transformer
+from engine.fontstuff.optimize_stf import read_stf
+from physics import integrators, nbody
+from physics.constants import G
+from physics.equations import Electricity, Gravitation, Mechanics, QuantumMechanics, Waves
+
+SEED = 1234
+FONT_FILE = os.path.join(os.path.dirname(__file__), '..', 'engine', 'assets', 'sgr_mono.stf')
+# Reference results committed with the suite, compared against by --compare without a file
+BASELINE_FILE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+RESULTS_VERSION = 1
+DEFAULT_THRESHOLD = 0.15
+
+BENCHMARKS = {}
+
+
+def benchmark(name, items=1):
+    # Registers a setup function. It gets a seeded numpy Generator and returns the
+    # callable to time; items is how much work one call does, for throughput numbers.
+    def register(setup):
+        BENCHMARKS[name] = (setup, items)
+        return setup
+    return register
+
+
+def _renderer(width=640, height=480):
+    # Renderer prints what it loaded; keep the benchmark output readable
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        return Renderer(width, height, FONT_FILE)
+
+
+# STF fonts
+
+@benchmark('stf.load', items=1)
+def stf_load(rng):
+    return lambda: STF(FONT_FILE, 10)
+
+
+@benchmark('stf.read_stf', items=1)
+def stf_read(rng):
+    return lambda: read_stf(FONT_FILE)
+
+
+# Shape construction
+
+@benchmark('shapes.cube', items=1000)
+def shapes_cube(rng):
+    centers = [Point3D(*p) for p in rng.uniform(-100, 100, (1000, 3)).tolist()]
+    return lambda: [ShapeFactory.create_cube(center, 10) for center in centers]
+
+
+@benchmark('shapes.uv_sphere_64', items=1)
+def shapes_uv_sphere(rng):
+    return lambda: ShapeFactory.create_uv_sphere(Point3D(0, 0, 0), 100, 64)
+
+
+@benchmark('shapes.ico_sphere_4', items=1)
+def shapes_ico_sphere(rng):
+    return lambda: ShapeFactory.create_ico_sphere(Point3D(0, 0, 0), 100, 4)
+
+
+@benchmark('shapes.torus_64', items=1)
+def shapes_torus(rng):
+    return lambda: ShapeFactory.create_torus(Point3D(0, 0, 0), 100, 30, 64)
+
+
+@benchmark('shapes.mesh_from_shape', items=200)
+def shapes_mesh_from_shape(rng):
+    shapes = [ShapeFactory.create_cube(Point3D(*p), 10) for p in rng.uniform(-100, 100, (200, 3)).tolist()]
+    return lambda: [Mesh.from_shape(shape) for shape in shapes]
+
+
+@benchmark('shapes.topology', items=1)
+def shapes_topology(rng):
+    mesh = ShapeFactory.create_ico_sphere(Point3D(0, 0, 0), 100, 4)
+    return lambda: Mesh(mesh.vertices, mesh.faces).topology
+
+
+# Transform and projection
+
+@benchmark('transform.apply_rotation', items=2000)
+def transform_apply_rotation(rng):
+    transformer = Transformer()
+    transformer.rotation_angles.update(x=12, y=34, z=56)
+    points = [Point3D(*p) for p in rng.uniform(-100, 100, (2000, 3)).tolist()]
+    return lambda: [transformer.apply_rotation(point) for point in points]
+
+
+@benchmark('transform.camera_project', items=100000)
+def transform_camera_project(rng):
+    camera = Camera(1280, 720)
+    camera.set_rotation((12, 34, 56))
+    points = rng.uniform(-300, 300, (100000, 3))
+
+    def run():
+        # Rotation changes every call, as it does every frame
+        camera.set_rotation((camera.rotation_angles[0] + 1, 34, 56))
+        return camera.project(points)
+    return run
+
+
+@benchmark('transform.weld', items=100000)
+def transform_weld(rng):
+    points = rng.uniform(-100, 100, (100000, 3))
+    return lambda: Mesh.weld_positions(points, 0.5)
+
+
+# Rasterization, one benchmark per line algorithm
+
+RASTER_LINES = 2000
+
+
+def _raster_benchmark(algorithm):
+    def setup(rng):
+        renderer = _renderer()
+        renderer.rendering_algorithm = renderer.active_algorithm = algorithm
+        # Some algorithms add random jitter
+        random.seed(SEED)
+        lines = np.column_stack([rng.integers(0, 640, RASTER_LINES), rng.integers(0, 480, RASTER_LINES),
+                                 rng.integers(0, 640, RASTER_LINES), rng.integers(0, 480, RASTER_LINES)]).tolist()
+
+        def run():
+            for x1, y1, x2, y2 in lines:
+                renderer.line_renderer(x1, y1, x2, y2)
+        return run
+    return setup
+
+
+for _algorithm in ('bresenham', 'midpoint', 'dda', 'simit', 'quantum', 'wu'):
+    benchmark(f'raster.{_algorithm}', items=RASTER_LINES)(_raster_benchmark(_algorithm))
+
+
+# Full headless frames
+
+def _frame_benchmark(populate):
+    def setup(rng):
+        renderer = _renderer()
+        populate(renderer, rng)
+        renderer.spinning = True
+
+        def run():
+            renderer.transformer.update_rotation()
+            renderer.render_pixels()
+        return run
+    return setup
+
+
+def _cube_scene(renderer, rng):
+    renderer.add_object(ShapeFactory.create_cube(Point3D(0, 0, 0), 200))
+
+
+def _sphere_scene(renderer, rng):
+    renderer.add_object(ShapeFactory.create_ico_sphere(Point3D(0, 0, 0), 180, 3))
+
+
+def _instanced_scene(renderer, rng):
+    # One mesh drawn from 27 scene nodes
+    mesh = ShapeFactory.create_ico_sphere(Point3D(0, 0, 0), 25, 1)
+    group = renderer.add_group()
+    for x in (-120, 0, 120):
+        for y in (-120, 0, 120):
+            for z in (-120, 0, 120):
+                renderer.add_object(mesh, parent=group, translation=(x, y, z),
+                                    rotation=tuple(rng.uniform(0, 360, 3)))
+
+
+benchmark('frame.cube', items=1)(_frame_benchmark(_cube_scene))
+benchmark('frame.sphere', items=1)(_frame_benchmark(_sphere_scene))
+benchmark('frame.instanced', items=1)(_frame_benchmark(_instanced_scene))
+
+
+# Physics equations, called once per sample as existing callers do
+
+PHYSICS_SAMPLES = 10000
+
+
+def _physics_benchmark(function, *ranges):
+    def setup(rng):
+        columns = [rng.uniform(low, high, PHYSICS_SAMPLES).tolist() for low, high in ranges]
+        rows = list(zip(*columns))
+        return lambda: [function(*row) for row in rows]
+    return setup
+
+
+PHYSICS = {
+    'gravitational_force': (Gravitation.gravitational_force, (1e20, 1e25), (1e20, 1e25), (1e6, 1e9)),
+    'escape_velocity': (Gravitation.escape_velocity, (1e20, 1e25), (1e5, 1e7)),
+    'kinetic_energy': (Mechanics.kinetic_energy, (1, 100), (0, 50)),
+    'force_electrostatics': (Electricity.force_electrostatics, (1e-9, 1e-6), (1e-9, 1e-6), (0.01, 1)),
+    'doppler_effect': (Waves.doppler_effect, (100, 1000), (100, 1000), (300, 350), (0, 30), (0, 30)),
+    'black_body_radiation_intensity': (QuantumMechanics.black_body_radiation_intensity, (1e12, 1e15), (300, 6000)),
+    'fermi_dirac_distribution': (QuantumMechanics.fermi_dirac_distribution, (0, 1e-19), (0, 1e-19), (100, 1000)),
+    'nuclear_decay': (QuantumMechanics.nuclear_decay, (1, 1000), (0.01, 1), (0, 10)),
+}
+
+PHYSICS_ARRAY_SAMPLES = 1000000
+
+
+def _physics_array_benchmark(function, *ranges):
+    # The whole sweep in one broadcasting call
+    def setup(rng):
+        columns = [rng.uniform(low, high, PHYSICS_ARRAY_SAMPLES) for low, high in ranges]
+        return lambda: function(*columns)
+    return setup
+
+
+for _name, (_function, *_ranges) in PHYSICS.items():
+    benchmark(f'physics.{_name}', items=PHYSICS_SAMPLES)(_physics_benchmark(_function, *_ranges))
+    benchmark(f'physics.array.{_name}', items=PHYSICS_ARRAY_SAMPLES)(_physics_array_benchmark(_function, *_ranges))
+
+
+# N-body, one leapfrog step per call, so items per second are body-steps per second
+
+def _nbody_benchmark(bodies, method):
+    def setup(rng):
+        simulation = nbody.Simulation(*nbody.plummer_sphere(bodies, total_mass=1 / G, seed=rng),
+                                      softening=0.01, method=method)
+        return lambda: simulation.step(0.001)
+    return setup
+
+
+for _bodies, _method in ((2048, 'direct'), (2048, 'barnes_hut'), (20000, 'barnes_hut')):
+    benchmark(f'physics.nbody.{_method}_{_bodies}', items=_bodies)(_nbody_benchmark(_bodies, _method))
+
+
+# Integrators, one step per call of a batch of particles on springs
+
+INTEGRATOR_PARTICLES = 100000
+
+
+def _spring(t, positions, velocities, out):
+    np.negative(positions, out=out)
+
+
+def _integrator_benchmark(integrator):
+    def setup(rng):
+        positions = rng.uniform(-1, 1, (INTEGRATOR_PARTICLES, 3))
+        velocities = np.zeros_like(positions)
+        stepper = integrator(_spring)
+        state = {'t': 0.0}
+
+        def run():
+            state['t'] = stepper.step(state['t'], positions, velocities, 1e-3)
+        return run
+    return setup
+
+
+for _integrator in (integrators.Euler, integrators.VelocityVerlet, integrators.RK4, integrators.RK45):
+    benchmark(f'physics.integrators.{_integrator.__name__}', items=INTEGRATOR_PARTICLES)(
+        _integrator_benchmark(_integrator))
+
+
+def run_benchmark(name, repeat, min_time):
+    setup, items = BENCHMARKS[name]
+    function = setup(np.random.default_rng(SEED))
+    function()  # Warm up caches, atlases and lazy topology
+
+    # Enough calls per sample that very short benchmarks still time reliably
+    start = time.perf_counter()
+    function()
+    single = time.perf_counter() - start
+    loops = max(1, int(min_time / single)) if single > 0 else 1000
+
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(loops):
+            function()
+        samples.append((time.perf_counter() - start) / loops)
+    median = statistics.median(samples)
+    return {
+        'median': median,
+        'min': min(samples),
+        'stdev': statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        'loops': loops,
+        'repeat': repeat,
+        'items': items,
+        'items_per_second': items / median if median > 0 else None,
+    }
+
+
+def compare(results, baseline, threshold):
+    # Returns [(name, baseline time, new time, ratio)] for benchmarks that got slower. The
+    # fastest sample is compared since it is the least affected by other load on the machine.
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get('results', {}).get(name)
+        if previous is None:
+            continue
+        ratio = result['min'] / previous['min']
+        if ratio > 1 + threshold:
+            regressions.append((name, previous['min'], result['min'], ratio))
+    return regressions
+
+
+def environment_differences(baseline):
+    # What differs between the machine that recorded the baseline and this one
+    recorded = baseline.get('environment', {})
+    current = environment()
+    return [(key, recorded.get(key), current[key]) for key in ('python', 'numpy', 'pygame', 'platform', 'machine')
+            if recorded.get(key) != current[key]]
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'numpy': np.__version__,
+        'pygame': pygame.version.ver,
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'seed': SEED,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the engine and physics benchmarks.")
+    parser.add_argument('-k', '--filter', action='append', default=[],
+                        help="Only run benchmarks whose name contains this (repeatable)")
+    parser.add_argument('-o', '--output', help="Write results as JSON to this file")
+    parser.add_argument('-c', '--compare', nargs='?', const=BASELINE_FILE, metavar='FILE',
+                        help="Compare against results saved earlier with --output and fail on slowdowns; "
+                             "without FILE, against the committed benchmarks/baseline.json")
+    parser.add_argument('-t', '--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f"Allowed slowdown against the baseline before failing (default {DEFAULT_THRESHOLD})")
+    parser.add_argument('-r', '--repeat', type=int, default=5, help="Timed samples per benchmark (default 5)")
+    parser.add_argument('--min-time', type=float, default=0.05,
+                        help="Minimum seconds per sample, short benchmarks are looped (default 0.05)")
+    parser.add_argument('-l', '--list', action='store_true', help="List benchmarks and exit")
+    args = parser.parse_args(argv)
+
+    names = [name for name in BENCHMARKS if not args.filter or any(f in name for f in args.filter)]
+    if args.list:
+        print("\n".join(names))
+        return 0
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        for key, recorded, current in environment_differences(baseline):
+            print(f"Note: baseline {key} is {recorded}, this run {current}; timings may not be comparable",
+                  file=sys.stderr)
+
+    results = {}
+    for name in names:
+        random.seed(SEED)
+        result = results[name] = run_benchmark(name, args.repeat, args.min_time)
+        line = f"{name:<48} {result['median'] * 1000:>10.3f} ms"
+        if result['items'] > 1:
+            line += f" {result['items_per_second']:>14,.0f} items/s"
+        if baseline and name in baseline.get('results', {}):
+            line += f"  x{result['min'] / baseline['results'][name]['min']:.2f}"
+        elif baseline:
+            line += "  (not in baseline)"
+        print(line, flush=True)
+    pygame.quit()
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'version': RESULTS_VERSION, 'environment': environment(), 'results': results}, f, indent=2)
+
+    if baseline:
+        regressions = compare(results, baseline, args.threshold)
+        for name, before, after, ratio in regressions:
+            print(f"REGRESSION {name}: {before * 1000:.3f} ms -> {after * 1000:.3f} ms ({ratio:.2f}x)",
+                  file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
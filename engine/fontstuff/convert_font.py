@@ -1,15 +1,29 @@
+import argparse
+import hashlib
+import io
+import json
+import os
 import string
+import sys
+from concurrent.futures import ProcessPoolExecutor
 from typing import List, Tuple, Dict, Optional
 from fontTools.ttLib import TTFont
+from fontTools.pens.basePen import BasePen
 from fontTools.pens.boundsPen import BoundsPen
-from fontTools.pens.recordingPen import RecordingPen
+from fontTools.pens.recordingPen import DecomposingRecordingPen, RecordingPen
 from fontTools.pens.transformPen import TransformPen
 from fontTools.misc.transform import Transform
 import logging
 
 TARGET_SIZE = 32000
 PADDING = 256
-SIMPLIFY_TOLERANCE = 0.005
+# Maximum deviation of the emitted polylines from the true outline, as a fraction of the
+# normalized glyph box, i.e. 0.004 * TARGET_SIZE = 128 units. Half of it goes to curve
+# flattening and half to Ramer-Douglas-Peucker simplification.
+SIMPLIFY_TOLERANCE = 0.004
+MAX_FLATTEN_DEPTH = 16
+# Below this many glyphs the process pool start-up costs more than it saves
+MIN_PARALLEL_GLYPHS = 128
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -18,17 +32,20 @@ logger = logging.getLogger(__name__)
 # Type aliases
 Contour = List[Tuple[str, Tuple]]
 Point = Tuple[float, float]
+Polyline = List[Point]
 
-# Hardcoded input and output file paths
-INPUT_FONT = "jbmono_regular.ttf"
-OUTPUT_FILE = "C:/Users/alfa/PycharmProjects/sgr/engine/assets/converted.stf"
+DEFAULT_CHARS = string.ascii_letters + string.digits + string.punctuation + ' '
+MANIFEST_SUFFIX = '.manifest.json'
+MANIFEST_VERSION = 1
 
 
+# Populated once per worker process by _init_worker
+_worker_glyph_set = None
 
 
-def extract_glyph_contours(glyph, font: TTFont) -> List[Contour]:
-    glyph_set = font.getGlyphSet()
-    recording_pen = RecordingPen()
+def extract_glyph_contours(glyph, glyph_set) -> List[Contour]:
+    # Components are decomposed here so the flattener only ever sees outlines
+    recording_pen = DecomposingRecordingPen(glyph_set)
 
     try:
         if hasattr(glyph, 'draw'):
@@ -46,8 +63,7 @@ def extract_glyph_contours(glyph, font: TTFont) -> List[Contour]:
     return [recording_pen.value]
 
 
-def normalize_glyph(contours: List[Contour], font: TTFont, glyph_name: str) -> List[Contour]:
-    glyph_set = font.getGlyphSet()
+def normalize_glyph(contours: List[Contour], glyph_set, glyph_name: str) -> List[Contour]:
     bounds_pen = BoundsPen(glyph_set)
 
     try:
@@ -80,106 +96,298 @@ def _transform_contour(contour: Contour, transform: Transform) -> Contour:
     return rec_pen.value
 
 
-def simplify_contours(contours: List[Contour], tolerance: float) -> List[Contour]:
-    return [_simplify_contour(contour, tolerance) for contour in contours]
+def simplify_contours(contours: List[Contour], tolerance: float) -> List[Polyline]:
+    # tolerance here is in the units of the contours, i.e. TARGET_SIZE per glyph box
+    polylines = []
+    for contour in contours:
+        polylines.extend(_simplify_contour(contour, tolerance))
+    return polylines
 
 
-def _simplify_contour(contour: Contour, tolerance: float) -> Contour:
-    simplified_contour = []
-    last_point = None
+def _simplify_contour(contour: Contour, tolerance: float) -> List[Polyline]:
+    flatten_pen = _FlattenPen(tolerance / 2)
     for cmd in contour:
         command, args = cmd if isinstance(cmd, tuple) else (cmd[0], cmd[1:])
-        if command == 'curveTo':
-            p0, p1, p2 = args
-            if (abs(p0[0] - p1[0]) + abs(p0[1] - p1[1]) +
-                abs(p1[0] - p2[0]) + abs(p1[1] - p2[1])) < tolerance:
-                simplified_contour.append(('lineTo', (p2,)))
-            else:
-                simplified_contour.append((command, args))
-        elif command == 'lineTo':
-            p = args[0]
-            if last_point and (abs(p[0] - last_point[0]) + abs(p[1] - last_point[1])) < tolerance:
-                continue
-            simplified_contour.append((command, args))
-        else:
-            simplified_contour.append((command, args))
+        getattr(flatten_pen, command)(*args)
+    flatten_pen.flush()
+
+    return [_rdp_simplify(polyline, tolerance / 2) for polyline in flatten_pen.polylines if len(polyline) > 1]
+
+
+class _FlattenPen(BasePen):
+    def __init__(self, tolerance: float):
+        super().__init__(None)
+        self.tolerance = tolerance
+        self.polylines: List[Polyline] = []
+        self._current: Polyline = []
+
+    def flush(self):
+        if self._current:
+            self.polylines.append(self._current)
+            self._current = []
+
+    def _moveTo(self, pt):
+        self.flush()
+        self._current = [pt]
+
+    def _lineTo(self, pt):
+        self._current.append(pt)
 
-        last_point = args[-1] if args else None
-    return simplified_contour
+    def _curveToOne(self, pt1, pt2, pt3):
+        _flatten_cubic(self._getCurrentPoint(), pt1, pt2, pt3, self.tolerance, self._current, 0)
 
+    def _qCurveToOne(self, pt1, pt2):
+        _flatten_quadratic(self._getCurrentPoint(), pt1, pt2, self.tolerance, self._current, 0)
 
-def convert_font_to_stf(input_font: str, output_file: str, chars_to_include: Optional[str] = None, simplify_tolerance: float = SIMPLIFY_TOLERANCE):
-    chars_to_include = chars_to_include or (string.ascii_letters + string.digits + string.punctuation + ' ')
+    def _closePath(self):
+        if self._current and self._current[-1] != self._current[0]:
+            self._current.append(self._current[0])
+        self.flush()
+
+    def _endPath(self):
+        self.flush()
+
+
+def _midpoint(a: Point, b: Point) -> Point:
+    return (a[0] + b[0]) / 2, (a[1] + b[1]) / 2
+
+
+def _flatten_cubic(p0: Point, p1: Point, p2: Point, p3: Point, tolerance: float, out: Polyline, depth: int):
+    # The curve lies inside the hull of its control points, so it is within
+    # tolerance of the chord once both handles are
+    if depth >= MAX_FLATTEN_DEPTH or max(_line_distance(p1, p0, p3), _line_distance(p2, p0, p3)) <= tolerance:
+        out.append(p3)
+        return
+    p01, p12, p23 = _midpoint(p0, p1), _midpoint(p1, p2), _midpoint(p2, p3)
+    p012, p123 = _midpoint(p01, p12), _midpoint(p12, p23)
+    mid = _midpoint(p012, p123)
+    _flatten_cubic(p0, p01, p012, mid, tolerance, out, depth + 1)
+    _flatten_cubic(mid, p123, p23, p3, tolerance, out, depth + 1)
+
+
+def _flatten_quadratic(p0: Point, p1: Point, p2: Point, tolerance: float, out: Polyline, depth: int):
+    # A quadratic strays at most half of its control point's distance from the chord
+    if depth >= MAX_FLATTEN_DEPTH or _line_distance(p1, p0, p2) / 2 <= tolerance:
+        out.append(p2)
+        return
+    p01, p12 = _midpoint(p0, p1), _midpoint(p1, p2)
+    mid = _midpoint(p01, p12)
+    _flatten_quadratic(p0, p01, mid, tolerance, out, depth + 1)
+    _flatten_quadratic(mid, p12, p2, tolerance, out, depth + 1)
+
+
+def _line_distance(p: Point, a: Point, b: Point) -> float:
+    dx, dy = b[0] - a[0], b[1] - a[1]
+    length_sq = dx * dx + dy * dy
+    if length_sq == 0:
+        return ((p[0] - a[0]) ** 2 + (p[1] - a[1]) ** 2) ** 0.5
+    t = max(0.0, min(1.0, ((p[0] - a[0]) * dx + (p[1] - a[1]) * dy) / length_sq))
+    return ((p[0] - a[0] - t * dx) ** 2 + (p[1] - a[1] - t * dy) ** 2) ** 0.5
+
+
+def _rdp_simplify(polyline: Polyline, tolerance: float) -> Polyline:
+    if len(polyline) < 3:
+        return polyline
+
+    last = len(polyline) - 1
+    if polyline[0] == polyline[last]:
+        # Closed contours have no chord to measure against, so split them at the
+        # point farthest from the start and simplify both halves
+        split = max(range(1, last), key=lambda i: _line_distance(polyline[i], polyline[0], polyline[0]))
+        head = _rdp_simplify(polyline[:split + 1], tolerance)
+        tail = _rdp_simplify(polyline[split:], tolerance)
+        return head + tail[1:]
+
+    keep = [False] * len(polyline)
+    keep[0] = keep[last] = True
+    stack = [(0, last)]
+    while stack:
+        start, end = stack.pop()
+        max_distance, index = 0.0, 0
+        for i in range(start + 1, end):
+            distance = _line_distance(polyline[i], polyline[start], polyline[end])
+            if distance > max_distance:
+                max_distance, index = distance, i
+        if max_distance > tolerance:
+            keep[index] = True
+            stack.append((start, index))
+            stack.append((index, end))
+
+    return [point for point, kept in zip(polyline, keep) if kept]
+
+
+def convert_font_to_stf(input_font: str, output_file: str, chars_to_include: Optional[str] = None,
+                        simplify_tolerance: float = SIMPLIFY_TOLERANCE, workers: Optional[int] = None,
+                        incremental: bool = False):
+    chars_to_include = chars_to_include or DEFAULT_CHARS
 
     try:
         font = TTFont(input_font)
     except Exception as e:
-        logger.error(f"Failed to load font file: {e}")
-        return
+        raise ValueError(f"Failed to load font file {input_font}: {e}") from e
+
+    settings = {'target_size': TARGET_SIZE, 'padding': PADDING, 'tolerance': simplify_tolerance}
+    previous_hashes, previous_blocks = {}, {}
+    if incremental:
+        previous_hashes, previous_blocks = _load_previous_output(output_file, settings)
 
     cmap = font.getBestCmap()
+    jobs = []
+    missing = 0
+    for char in dict.fromkeys(chars_to_include):
+        glyph_name = cmap.get(ord(char))
+        if not glyph_name or not char.isprintable():
+            missing += 1
+            logger.debug(f"No glyph found for character '{char}'. Skipping.")
+            continue
+        previous_hash = previous_hashes.get(char) if char in previous_blocks else None
+        jobs.append((char, glyph_name, simplify_tolerance, previous_hash))
+    if missing:
+        logger.warning(f"{missing} requested characters have no glyph in {input_font}. Skipped.")
+
+    workers = workers or os.cpu_count() or 1
+    hashes = {}
+    temp_file = output_file + '.tmp'
+    with open(temp_file, 'w', encoding='utf-8') as f:
+        if workers == 1 or len(jobs) < MIN_PARALLEL_GLYPHS:
+            glyph_set = font.getGlyphSet()
+            results = (_convert_glyph(glyph_set, *job) for job in jobs)
+            stats = _write_results(f, results, previous_blocks, hashes)
+        else:
+            # Each worker loads the font once; map() yields in submission order so the
+            # output is streamed in the same character order as a sequential run
+            chunksize = max(1, len(jobs) // (workers * 4))
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(input_font,)) as executor:
+                stats = _write_results(f, executor.map(_convert_glyph_worker, jobs, chunksize=chunksize),
+                                       previous_blocks, hashes)
+
+    os.replace(temp_file, output_file)
+    with open(output_file + MANIFEST_SUFFIX, 'w', encoding='utf-8') as f:
+        json.dump({'version': MANIFEST_VERSION, 'settings': settings,
+                   'glyphs': {f"U+{ord(char):04X}": digest for char, digest in hashes.items()}}, f, indent=0)
+
+    converted, reused = stats
+    logger.info(f"Conversion complete. {converted} glyphs converted, {reused} reused. STF file saved as {output_file}")
+
+
+def _write_results(file, results, previous_blocks: Dict[str, str], hashes: Dict[str, str]) -> Tuple[int, int]:
+    converted = reused = 0
+    for char, digest, block in results:
+        if digest is None:
+            logger.warning(f"Empty glyph for character '{char}'. Skipping.")
+            continue
+        hashes[char] = digest
+        if block is None:
+            block = previous_blocks[char]
+            reused += 1
+        else:
+            converted += 1
+        file.write(block)
+    return converted, reused
+
 
-    with open(output_file, 'w') as f:
-        for char in chars_to_include:
-            glyph_name = cmap.get(ord(char))
-            if not glyph_name:
-                logger.warning(f"No glyph found for character '{char}'. Skipping.")
+def _load_previous_output(output_file: str, settings: Dict) -> Tuple[Dict[str, str], Dict[str, str]]:
+    try:
+        with open(output_file + MANIFEST_SUFFIX, encoding='utf-8') as f:
+            manifest = json.load(f)
+        blocks = _read_stf_blocks(output_file)
+    except (OSError, ValueError) as e:
+        logger.info(f"No usable previous conversion ({e}). Converting everything.")
+        return {}, {}
+
+    if manifest.get('version') != MANIFEST_VERSION or manifest.get('settings') != settings:
+        logger.info("Conversion settings changed since the last run. Converting everything.")
+        return {}, {}
+
+    hashes = {chr(int(key[2:], 16)): digest for key, digest in manifest.get('glyphs', {}).items()}
+    return hashes, blocks
+
+
+def _read_stf_blocks(stf_file: str) -> Dict[str, str]:
+    blocks = {}
+    current_char, current_lines = None, []
+    with open(stf_file, encoding='utf-8') as f:
+        for line in f:
+            if current_char is None:
+                if line.startswith('char ') and line.rstrip('\n').endswith(' {'):
+                    current_char = line.rstrip('\n')[len('char '):-len(' {')]
+                    current_lines = [line]
+                continue
+            current_lines.append(line)
+            if line.startswith('struct('):
                 continue
+            if line == '}\n' and current_lines[-2].startswith('struct('):
+                current_lines.append('\n')
+                blocks[current_char] = ''.join(current_lines)
+                current_char = None
+    return blocks
 
-            glyph = font.getGlyphSet()[glyph_name]
-            contours = _process_glyph(glyph, font)
 
-            if not contours:
-                logger.warning(f"Empty glyph for character '{char}'. Skipping.")
-                continue
+def _init_worker(input_font: str):
+    global _worker_glyph_set
+    _worker_glyph_set = TTFont(input_font).getGlyphSet()
+
 
-            normalized_contours = normalize_glyph(contours, font, glyph_name)
-            simplified_contours = simplify_contours(normalized_contours, simplify_tolerance)
+def _convert_glyph_worker(job: Tuple[str, str, float, Optional[str]]) -> Tuple[str, Optional[str], Optional[str]]:
+    return _convert_glyph(_worker_glyph_set, *job)
 
-            _write_glyph_to_stf(f, char, simplified_contours)
 
-        logger.info(f"Conversion complete. STF file saved as {output_file}")
+def _convert_glyph(glyph_set, char: str, glyph_name: str, simplify_tolerance: float,
+                   previous_hash: Optional[str] = None) -> Tuple[str, Optional[str], Optional[str]]:
+    contours = _process_glyph(glyph_set[glyph_name], glyph_set)
+    if not contours:
+        return char, None, None
 
+    digest = _outline_hash(contours)
+    if digest == previous_hash:
+        return char, digest, None
 
-def _process_glyph(glyph, font: TTFont) -> List[Contour]:
+    normalized_contours = normalize_glyph(contours, glyph_set, glyph_name)
+    simplified_contours = simplify_contours(normalized_contours, simplify_tolerance * TARGET_SIZE)
+
+    buffer = io.StringIO()
+    _write_glyph_to_stf(buffer, char, simplified_contours)
+    return char, digest, buffer.getvalue()
+
+
+def _outline_hash(contours: List[Contour]) -> str:
+    return hashlib.sha1(repr(contours).encode('utf-8')).hexdigest()
+
+
+def _process_glyph(glyph, glyph_set) -> List[Contour]:
     if hasattr(glyph, 'numberOfContours') and glyph.numberOfContours == 0:
         if hasattr(glyph, 'components'):
             contours = []
             for component in glyph.components:
-                base_glyph = font.getGlyphSet()[component.glyphName]
-                base_contours = extract_glyph_contours(base_glyph, font)
+                base_glyph = glyph_set[component.glyphName]
+                base_contours = extract_glyph_contours(base_glyph, glyph_set)
                 contours.extend(base_contours)
             return contours
         else:
             return []
     else:
-        return extract_glyph_contours(glyph, font)
+        return extract_glyph_contours(glyph, glyph_set)
 
 
-def _write_glyph_to_stf(file, char: str, contours: List[Contour]):
+def _write_glyph_to_stf(file, char: str, polylines: List[Polyline]):
     file.write(f"char {char} {{\n")
     file.write("init {\n")
 
     point_index = 1
     connections = []
 
-    for contour in contours:
+    for polyline in polylines:
+        # The renderer closes every connection itself, so a closed contour's repeated
+        # start point would only add a zero-length segment
+        points = polyline[:-1] if polyline[0] == polyline[-1] else polyline
+        if len(points) < 2:
+            continue
         current_connection = []
-        for cmd, args in contour:
-            if cmd == 'moveTo':
-                if current_connection:
-                    connections.append(current_connection)
-                current_connection = [point_index]
-            if cmd in ['moveTo', 'lineTo', 'curveTo', 'qCurveTo']:
-                x, y = args[-1]
-                file.write(f"{point_index}[{x / TARGET_SIZE:.6f},{1 - y / TARGET_SIZE:.6f}];\n")
-                current_connection.append(point_index)
-                point_index += 1
-
-        if current_connection:
-            if current_connection[0] != current_connection[-1]:
-                current_connection.append(current_connection[0])
-            connections.append(current_connection)
+        for x, y in points:
+            file.write(f"{point_index}[{x / TARGET_SIZE:.6f},{1 - y / TARGET_SIZE:.6f}];\n")
+            current_connection.append(point_index)
+            point_index += 1
+        connections.append(current_connection)
 
     file.write("}\n")
     file.write("struct(")
@@ -188,14 +396,50 @@ def _write_glyph_to_stf(file, char: str, contours: List[Contour]):
     file.write("}\n\n")
 
 
-def main():
-    # Use hardcoded values instead of argparse
-    input_font = INPUT_FONT
-    output_file = OUTPUT_FILE
-    chars_to_include = None  # Use default characters
-    simplify_tolerance = SIMPLIFY_TOLERANCE
-
-    convert_font_to_stf(input_font, output_file, chars_to_include, simplify_tolerance)
+def parse_unicode_range(spec: str) -> str:
+    def codepoint(value: str) -> int:
+        value = value.strip()
+        if value[:2].upper() in ('U+', '0X'):
+            return int(value[2:], 16)
+        return int(value)
+
+    start, _, end = spec.partition('-')
+    first = codepoint(start)
+    last = codepoint(end) if end else first
+    if first > last:
+        raise argparse.ArgumentTypeError(f"Invalid Unicode range '{spec}'")
+    return ''.join(chr(c) for c in range(first, last + 1))
+
+
+def read_charset_file(path: str) -> str:
+    with open(path, encoding='utf-8') as f:
+        return ''.join(c for c in f.read() if c not in '\r\n')
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Convert a TrueType font into an STF stroke font.")
+    parser.add_argument('input_font', help="TTF/OTF font to convert")
+    parser.add_argument('output_file', help="STF file to write")
+    parser.add_argument('-r', '--range', dest='ranges', action='append', type=parse_unicode_range, default=[],
+                        metavar='RANGE', help="Unicode range such as U+0020-U+007E or 0x4E00-0x9FFF; repeatable")
+    parser.add_argument('-c', '--charset-file', dest='charset_files', action='append', default=[],
+                        metavar='FILE', help="UTF-8 text file whose characters are converted; repeatable")
+    parser.add_argument('--chars', default='', help="Literal characters to convert")
+    parser.add_argument('-t', '--tolerance', type=float, default=SIMPLIFY_TOLERANCE,
+                        help=f"Outline error budget as a fraction of the glyph box (default {SIMPLIFY_TOLERANCE})")
+    parser.add_argument('-j', '--workers', type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument('-i', '--incremental', action='store_true',
+                        help="Only reconvert glyphs whose outline changed since the last run")
+    args = parser.parse_args(argv)
+
+    chars_to_include = ''.join(args.ranges) + ''.join(read_charset_file(path) for path in args.charset_files) + args.chars
+    try:
+        convert_font_to_stf(args.input_font, args.output_file, chars_to_include or None, args.tolerance,
+                            workers=args.workers, incremental=args.incremental)
+    except (OSError, ValueError) as e:
+        # Build scripts rely on the exit status to notice a failed conversion
+        logger.error(str(e))
+        sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,227 @@
+import argparse
+import logging
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+WELD_TOLERANCE = 1e-6
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Type aliases
+Point = Tuple[float, float]
+Glyph = Tuple[str, Dict[int, Point], List[List[int]]]
+Edge = Tuple[int, int]
+
+
+def read_stf(stf_file: str) -> List[Glyph]:
+    glyphs = []
+    current_char = None
+    current_points: Dict[int, Point] = {}
+    current_connections: List[List[int]] = []
+
+    with open(stf_file, encoding='utf-8') as f:
+        for line in f:
+            line = line.rstrip('\n')
+            stripped = line.strip()
+            if line.startswith('char ') and line.endswith(' {'):
+                if current_char is not None:
+                    glyphs.append((current_char, current_points, current_connections))
+                current_char = line[len('char '):-len(' {')]
+                current_points, current_connections = {}, []
+            elif stripped.startswith('init'):
+                continue
+            elif stripped.startswith('struct'):
+                struct_content = stripped[stripped.index('(') + 1:stripped.index(')')]
+                for segment in struct_content.split('/'):
+                    connection = [int(x) for x in segment.split('>') if x]
+                    if connection:
+                        current_connections.append(connection)
+            elif '[' in stripped and ']' in stripped:
+                point_id, coords = stripped.split('[')
+                x, y = map(float, coords.strip('];').split(','))
+                current_points[int(point_id)] = (x, y)
+
+    if current_char is not None:
+        glyphs.append((current_char, current_points, current_connections))
+    return glyphs
+
+
+def count_segments(connections: List[List[int]]) -> int:
+    # Renderer.render_character draws one line per point, wrapping back to the start
+    return sum(len(connection) for connection in connections)
+
+
+def optimize_glyph(points: Dict[int, Point], connections: List[List[int]],
+                   tolerance: float = WELD_TOLERANCE) -> Tuple[List[Point], List[List[int]]]:
+    vertices, welded = _weld_points(points, tolerance)
+    edges = _drawn_edges(connections, welded)
+
+    adjacency: Dict[int, List[Tuple[int, int]]] = {}
+    edge_list: List[Edge] = []
+    for a, b in sorted(edges):
+        _add_edge(adjacency, edge_list, a, b)
+    _pair_odd_vertices(adjacency, edge_list)
+
+    used = [False] * len(edge_list)
+    circuits = []
+    for start in sorted(adjacency):
+        if any(not used[edge_id] for _, edge_id in adjacency[start]):
+            circuits.append(_euler_circuit(start, adjacency, used))
+
+    # Renumber points in the order the new strokes visit them, keeping unused
+    # points so glyph bounds and metrics stay the same
+    order: Dict[int, int] = {}
+    new_connections = []
+    for circuit in circuits:
+        # The renderer closes every connection itself, so drop the repeated start point
+        new_connections.append([order.setdefault(v, len(order) + 1) for v in circuit[:-1]])
+    for v in range(len(vertices)):
+        order.setdefault(v, len(order) + 1)
+
+    new_points = [None] * len(order)
+    for v, index in order.items():
+        new_points[index - 1] = vertices[v]
+    return new_points, new_connections
+
+
+def _weld_points(points: Dict[int, Point], tolerance: float) -> Tuple[List[Point], Dict[int, int]]:
+    vertices: List[Point] = []
+    grid: Dict[Tuple[int, int], List[int]] = {}
+    welded: Dict[int, int] = {}
+    for point_id, (x, y) in sorted(points.items()):
+        cell = (round(x / tolerance), round(y / tolerance))
+        neighbours = (v for dx in (-1, 0, 1) for dy in (-1, 0, 1) for v in grid.get((cell[0] + dx, cell[1] + dy), ()))
+        match = next((v for v in neighbours
+                      if abs(vertices[v][0] - x) <= tolerance and abs(vertices[v][1] - y) <= tolerance), None)
+        if match is None:
+            match = len(vertices)
+            vertices.append((x, y))
+            grid.setdefault(cell, []).append(match)
+        welded[point_id] = match
+    return vertices, welded
+
+
+def _drawn_edges(connections: List[List[int]], welded: Dict[int, int]) -> set:
+    edges = set()
+    for connection in connections:
+        # Missing point ids are skipped by the renderer as well
+        chain = [welded[p] for p in connection if p in welded]
+        for i in range(len(chain)):
+            a, b = chain[i], chain[(i + 1) % len(chain)]
+            if a != b:
+                edges.add((min(a, b), max(a, b)))
+    return edges
+
+
+def _add_edge(adjacency: Dict[int, List[Tuple[int, int]]], edge_list: List[Edge], a: int, b: int):
+    edge_id = len(edge_list)
+    edge_list.append((a, b))
+    adjacency.setdefault(a, []).append((b, edge_id))
+    adjacency.setdefault(b, []).append((a, edge_id))
+
+
+def _pair_odd_vertices(adjacency: Dict[int, List[Tuple[int, int]]], edge_list: List[Edge]):
+    # Connections are always drawn as closed loops, so every vertex needs an even
+    # degree. Retrace the shortest path between pairs of odd vertices to get there.
+    odd = {v for v, neighbours in adjacency.items() if len(neighbours) % 2}
+    while odd:
+        start = min(odd)
+        odd.discard(start)
+        previous = {start: None}
+        queue = deque([start])
+        end = None
+        while queue:
+            v = queue.popleft()
+            if v in odd:
+                end = v
+                break
+            for neighbour, _ in adjacency[v]:
+                if neighbour not in previous:
+                    previous[neighbour] = v
+                    queue.append(neighbour)
+        # Odd vertices always come in pairs within a connected component
+        odd.discard(end)
+        while previous[end] is not None:
+            _add_edge(adjacency, edge_list, previous[end], end)
+            end = previous[end]
+
+
+def _euler_circuit(start: int, adjacency: Dict[int, List[Tuple[int, int]]], used: List[bool]) -> List[int]:
+    position = {v: 0 for v in adjacency}
+    stack = [start]
+    circuit = []
+    while stack:
+        v = stack[-1]
+        neighbours = adjacency[v]
+        while position[v] < len(neighbours) and used[neighbours[position[v]][1]]:
+            position[v] += 1
+        if position[v] == len(neighbours):
+            circuit.append(stack.pop())
+        else:
+            neighbour, edge_id = neighbours[position[v]]
+            used[edge_id] = True
+            stack.append(neighbour)
+    return circuit[::-1]
+
+
+def _format_coord(value: float) -> str:
+    text = f"{value:.6f}".rstrip('0').rstrip('.')
+    return '0' if text in ('', '-0') else text
+
+
+def _write_glyph(file, char: str, points: List[Point], connections: List[List[int]]):
+    file.write(f"char {char} {{\n")
+    file.write("init {\n")
+    for index, (x, y) in enumerate(points, start=1):
+        file.write(f"{index}[{_format_coord(x)},{_format_coord(y)}];\n")
+    file.write("}\n")
+    file.write("struct(")
+    file.write('/'.join('>'.join(str(p) for p in conn) for conn in connections))
+    file.write(")\n")
+    file.write("}\n\n")
+
+
+def optimize_stf(input_file: str, output_file: str, tolerance: float = WELD_TOLERANCE) -> Dict[str, int]:
+    glyphs = read_stf(input_file)
+    stats = {'glyphs': len(glyphs), 'points_before': 0, 'points_after': 0, 'strokes_before': 0,
+             'strokes_after': 0, 'segments_before': 0, 'segments_after': 0}
+
+    with open(output_file, 'w', encoding='utf-8') as f:
+        for char, points, connections in glyphs:
+            new_points, new_connections = optimize_glyph(points, connections, tolerance)
+            _write_glyph(f, char, new_points, new_connections)
+
+            stats['points_before'] += len(points)
+            stats['points_after'] += len(new_points)
+            stats['strokes_before'] += len(connections)
+            stats['strokes_after'] += len(new_connections)
+            stats['segments_before'] += count_segments(connections)
+            stats['segments_after'] += count_segments(new_connections)
+
+    return stats
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Weld points and merge strokes in an STF font.")
+    parser.add_argument('input_file', help="STF file to optimize")
+    parser.add_argument('output_file', nargs='?', help="Where to write the result")
+    parser.add_argument('--in-place', action='store_true',
+                        help="Overwrite the input file instead of writing output_file")
+    parser.add_argument('-t', '--tolerance', type=float, default=WELD_TOLERANCE,
+                        help=f"Distance below which points are welded, in STF units (default {WELD_TOLERANCE})")
+    args = parser.parse_args(argv)
+    # Welding is lossy, so the source is only replaced when asked for explicitly
+    if args.in_place == bool(args.output_file):
+        parser.error("give either output_file or --in-place")
+
+    stats = optimize_stf(args.input_file, args.output_file or args.input_file, args.tolerance)
+    before, after = stats['segments_before'], stats['segments_after']
+    reduction = 100 * (before - after) / before if before else 0
+    logger.info(f"{stats['glyphs']} glyphs: points {stats['points_before']} -> {stats['points_after']}, "
+                f"strokes {stats['strokes_before']} -> {stats['strokes_after']}, "
+                f"segments {before} -> {after} ({reduction:.1f}% fewer)")
+
+
+if __name__ == "__main__":
+    main()
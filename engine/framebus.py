@@ -0,0 +1,194 @@
+import socket
+import struct
+import sys
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+MAGIC = 0x53475246  # 'SGRF'
+VERSION = 1
+HEADER_SIZE = 64
+SLOT_HEADER_SIZE = 64
+ALIGNMENT = 64
+
+# magic, version, width, height, channels, slot count, notification port, slot stride, latest frame number
+HEADER_FORMAT = '<7IxxxxQQ'
+# Sent to subscribers after every frame: frame number, slot
+NOTIFY_FORMAT = '<QI'
+SUBSCRIBE = b'subscribe'
+UNSUBSCRIBE = b'unsubscribe'
+
+
+def _align(size):
+    return (size + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+class _FrameBuffer:
+    # Shared layout:
+    #   header | slot 0 header | slot 0 pixels | slot 1 header | ...
+    # Each slot header holds a seqlock counter (odd while the slot is being written),
+    # the frame number stored in it and its timestamp.
+
+    def _map(self, width, height, channels, slots):
+        self.width, self.height, self.channels, self.slots = width, height, channels, slots
+        frame_size = width * height * channels
+        self.slot_stride = SLOT_HEADER_SIZE + _align(frame_size)
+        buffer = self.shm.buf
+        self.slot_headers = []
+        self.slot_pixels = []
+        for slot in range(slots):
+            start = HEADER_SIZE + slot * self.slot_stride
+            self.slot_headers.append(np.ndarray((4,), dtype=np.uint64, buffer=buffer, offset=start))
+            self.slot_pixels.append(np.ndarray((height, width, channels), dtype=np.uint8, buffer=buffer,
+                                               offset=start + SLOT_HEADER_SIZE))
+        self.latest = np.ndarray((1,), dtype=np.uint64, buffer=buffer, offset=struct.calcsize(HEADER_FORMAT) - 8)
+
+    def _release(self):
+        # Views into the buffer have to go before the mapping can be closed
+        self.slot_headers = []
+        self.slot_pixels = []
+        self.latest = None
+        self.shm.close()
+
+
+class FramePublisher(_FrameBuffer):
+    def __init__(self, width, height, slots=3, name=None, channels=3):
+        size = HEADER_SIZE + slots * (SLOT_HEADER_SIZE + _align(width * height * channels))
+        self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        self.name = self.shm.name
+        self._map(width, height, channels, slots)
+
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.bind(('127.0.0.1', 0))
+        self.socket.setblocking(False)
+        self.port = self.socket.getsockname()[1]
+        self.subscribers = set()
+        self.frame_number = 0
+
+        struct.pack_into(HEADER_FORMAT, self.shm.buf, 0, MAGIC, VERSION, width, height, channels, slots,
+                         self.port, self.slot_stride, 0)
+
+    def publish(self, pixels):
+        # pixels is (width, height, channels) as pygame.surfarray hands it out. Never
+        # waits on consumers: the oldest slot is simply overwritten
+        self.frame_number += 1
+        slot = self.frame_number % self.slots
+        header = self.slot_headers[slot]
+        header[0] += 1
+        np.copyto(self.slot_pixels[slot], pixels.swapaxes(0, 1))
+        header[1] = self.frame_number
+        header[2:3].view(np.float64)[0] = time.time()
+        header[0] += 1
+        self.latest[0] = self.frame_number
+        self._notify(slot)
+        return self.frame_number
+
+    def _notify(self, slot):
+        while True:
+            try:
+                message, address = self.socket.recvfrom(64)
+            except (BlockingIOError, ConnectionError):
+                break
+            if message == SUBSCRIBE:
+                self.subscribers.add(address)
+            elif message == UNSUBSCRIBE:
+                self.subscribers.discard(address)
+
+        payload = struct.pack(NOTIFY_FORMAT, self.frame_number, slot)
+        for address in list(self.subscribers):
+            try:
+                self.socket.sendto(payload, address)
+            except BlockingIOError:
+                # Subscriber isn't keeping up; it can still catch up from shared memory
+                pass
+            except OSError:
+                self.subscribers.discard(address)
+
+    def close(self):
+        self.socket.close()
+        self._release()
+        self.shm.unlink()
+
+
+class Frame:
+    def __init__(self, subscriber, slot, number, timestamp, counter, pixels):
+        self.subscriber = subscriber
+        self.slot = slot
+        self.number = number
+        self.timestamp = timestamp
+        self.pixels = pixels
+        self._counter = counter
+
+    def valid(self):
+        # pixels is a view into shared memory; check this after using it to make
+        # sure the publisher didn't reuse the slot in the meantime
+        return int(self.subscriber.slot_headers[self.slot][0]) == self._counter
+
+
+class FrameSubscriber(_FrameBuffer):
+    def __init__(self, name):
+        if sys.version_info >= (3, 13):
+            self.shm = shared_memory.SharedMemory(name=name, track=False)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            # Attaching registers the block with the resource tracker, which would unlink
+            # it when this process exits; the publisher owns it
+            resource_tracker.unregister(self.shm._name, 'shared_memory')
+
+        magic, version, width, height, channels, slots, port, _, _ = struct.unpack_from(HEADER_FORMAT, self.shm.buf)
+        if magic != MAGIC or version != VERSION:
+            self.shm.close()
+            raise ValueError(f"{name} is not a frame buffer this version can read")
+        self._map(width, height, channels, slots)
+
+        self.address = ('127.0.0.1', port)
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.bind(('127.0.0.1', 0))
+        self.socket.sendto(SUBSCRIBE, self.address)
+
+    def read(self, slot, copy=False):
+        header = self.slot_headers[slot]
+        counter = int(header[0])
+        if counter % 2:
+            return None
+        pixels = self.slot_pixels[slot]
+        if copy:
+            pixels = pixels.copy()
+        frame = Frame(self, slot, int(header[1]), float(header[2:3].view(np.float64)[0]), counter, pixels)
+        if copy and not frame.valid():
+            return None
+        return frame
+
+    def latest_frame(self, copy=False):
+        number = int(self.latest[0])
+        if number == 0:
+            return None
+        return self.read(number % self.slots, copy)
+
+    def wait(self, timeout=None, copy=False):
+        # Blocks until the publisher announces a frame; returns None on timeout or when
+        # the announced frame was already overwritten
+        self.socket.settimeout(timeout)
+        try:
+            message = self.socket.recv(64)
+        except socket.timeout:
+            return None
+        # Skip straight to the newest announcement if several queued up
+        self.socket.setblocking(False)
+        try:
+            while True:
+                message = self.socket.recv(64)
+        except (BlockingIOError, ConnectionError):
+            pass
+        number, slot = struct.unpack(NOTIFY_FORMAT, message)
+        frame = self.read(slot, copy)
+        return frame if frame is not None and frame.number == number else None
+
+    def close(self):
+        try:
+            self.socket.sendto(UNSUBSCRIBE, self.address)
+        except OSError:
+            pass
+        self.socket.close()
+        self._release()
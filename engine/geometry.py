@@ -1,8 +1,27 @@
 import math
+import numpy as np
+
+# Neighboring cells searched from each point while welding: its own cell and the half of
+# the 26 around it that sort after it, the other half find the point from their side
+WELD_OFFSETS = [(dx, dy, dz) for dx in (-1, 0, 1) for dy in (-1, 0, 1) for dz in (-1, 0, 1)
+                if (dx, dy, dz) >= (0, 0, 0)]
+# Grid cells per axis while welding; packed cell keys take 3 * 21 bits
+WELD_GRID = 1 << 21
+# Candidate pairs distance-checked at a time while welding
+WELD_BLOCK = 1 << 20
+# Vectorized rounds settling weld merges before the rest are settled one at a time
+WELD_ROUNDS = 16
+
+
+def _ranges(counts):
+    # 0 .. n - 1 for every n in counts, concatenated
+    return np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
 
 
 
 class Vertices:
+    __slots__ = ('x', 'y')
+
     def __init__(self, x, y):
         self.x = x
         self.y = y
@@ -14,12 +33,129 @@ class Vertices:
         return f'({self.x}, {self.y})'
 
 class Point3D:
+    __slots__ = ('x', 'y', 'z')
+
     def __init__(self, x, y, z):
         self.x = x
         self.y = y
         self.z = z
 
+    def distance(self, other):
+        return ((self.x - other.x) ** 2 + (self.y - other.y) ** 2 + (self.z - other.z) ** 2) ** 0.5
+
+class PointPool:
+    # Struct of arrays: row 0 holds every x, row 1 every y and row 2 every z
+    def __init__(self, capacity=1024):
+        self.coords = np.zeros((3, max(capacity, 1)))
+        self.size = 0
+
+    @staticmethod
+    def from_positions(positions):
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+        pool = PointPool(len(positions))
+        pool.extend(positions)
+        return pool
+
+    def _reserve(self, count):
+        capacity = self.coords.shape[1]
+        if self.size + count > capacity:
+            # Views keep working across growth, arrays handed out earlier do not
+            grown = np.zeros((3, max(self.size + count, capacity * 2)))
+            grown[:, :self.size] = self.coords[:, :self.size]
+            self.coords = grown
+
+    def add(self, x, y, z):
+        self._reserve(1)
+        self.coords[:, self.size] = (x, y, z)
+        self.size += 1
+        return PointView(self, self.size - 1)
+
+    def extend(self, positions):
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+        self._reserve(len(positions))
+        start = self.size
+        self.coords[:, start:start + len(positions)] = positions.T
+        self.size += len(positions)
+        return range(start, self.size)
+
+    @property
+    def x(self):
+        return self.coords[0, :self.size]
+
+    @property
+    def y(self):
+        return self.coords[1, :self.size]
+
+    @property
+    def z(self):
+        return self.coords[2, :self.size]
+
+    def positions(self):
+        # (N, 3) view over the pool without copying
+        return self.coords[:, :self.size].T
+
+    def to_mesh(self, faces):
+        return Mesh(self.positions(), faces)
+
+    def __getitem__(self, index):
+        if not -self.size <= index < self.size:
+            raise IndexError("PointPool index out of range")
+        return PointView(self, index % self.size)
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        return (PointView(self, i) for i in range(self.size))
+
+class PointView:
+    # Point3D-compatible handle onto one entry of a PointPool
+    __slots__ = ('pool', 'index')
+
+    def __init__(self, pool, index):
+        self.pool = pool
+        self.index = index
+
+    @property
+    def x(self):
+        return self.pool.coords[0, self.index]
+
+    @x.setter
+    def x(self, value):
+        self.pool.coords[0, self.index] = value
+
+    @property
+    def y(self):
+        return self.pool.coords[1, self.index]
+
+    @y.setter
+    def y(self, value):
+        self.pool.coords[1, self.index] = value
+
+    @property
+    def z(self):
+        return self.pool.coords[2, self.index]
+
+    @z.setter
+    def z(self, value):
+        self.pool.coords[2, self.index] = value
+
+    def distance(self, other):
+        return ((self.x - other.x) ** 2 + (self.y - other.y) ** 2 + (self.z - other.z) ** 2) ** 0.5
+
+    def __eq__(self, other):
+        return isinstance(other, PointView) and self.pool is other.pool and self.index == other.index
+
+    def __hash__(self):
+        return hash((id(self.pool), self.index))
+
+    def __str__(self):
+        return f'({self.x}, {self.y}, {self.z})'
+
 class Triangle:
+    # __weakref__ lets a lone triangle be a scene object, cached weakly by the renderer
+    __slots__ = ('a', 'b', 'c', '__weakref__')
+
     def __init__(self, a, b, c):
         self.a = a
         self.b = b
@@ -54,16 +190,16 @@ class Quadrilateral:
 class Cube:
     def __init__(self, vertices):
         self.triangles = [
-            Triangle(vertices[0], vertices[1], vertices[2]), Triangle(vertices[0], vertices[2], vertices[3]),
+            Triangle(vertices[0], vertices[2], vertices[1]), Triangle(vertices[0], vertices[3], vertices[2]),
             Triangle(vertices[4], vertices[5], vertices[6]), Triangle(vertices[4], vertices[6], vertices[7]),
             Triangle(vertices[0], vertices[1], vertices[5]), Triangle(vertices[0], vertices[5], vertices[4]),
             Triangle(vertices[2], vertices[3], vertices[7]), Triangle(vertices[2], vertices[7], vertices[6]),
             Triangle(vertices[1], vertices[2], vertices[6]), Triangle(vertices[1], vertices[6], vertices[5]),
-            Triangle(vertices[0], vertices[3], vertices[7]), Triangle(vertices[0], vertices[7], vertices[4])
+            Triangle(vertices[0], vertices[7], vertices[3]), Triangle(vertices[0], vertices[4], vertices[7])
         ]
 
     def volume(self):
-        edge_length = self.triangles[0].a.distance(self.triangles[0].b)
+        edge_length = self.triangles[0].a.distance(self.triangles[0].c)
         return edge_length ** 3
 
     def surface_area(self):
@@ -80,16 +216,378 @@ class CustomShape:
         return sum(triangle.area() for triangle in self.triangles)
 
     def perimeter(self):
-        edges = set()
-        for triangle in self.triangles:
-            edges.add((triangle.a, triangle.b))
-            edges.add((triangle.b, triangle.c))
-            edges.add((triangle.c, triangle.a))
-        return sum(edge[0].distance(edge[1]) for edge in edges)
+        return Mesh.from_shape(self).perimeter()
 
     def __str__(self):
         return f'{self.triangles}'
 
+class Mesh:
+    def __init__(self, vertices, faces):
+        self.vertices = np.asarray(vertices, dtype=np.float64).reshape(-1, 3)
+        self.faces = np.asarray(faces, dtype=np.int64).reshape(-1, 3)
+        # Bumped by mark_dirty, so caches of transformed vertices know to redo them
+        self.version = 0
+        self._topology = None
+
+    def mark_dirty(self):
+        # Call after editing vertices in place; assigning new vertices is noticed without it
+        self.version += 1
+
+    @property
+    def topology(self):
+        # Built on first use; vertices may move but the faces must not change afterwards
+        if self._topology is None:
+            self._topology = MeshTopology(self.faces, len(self.vertices))
+        return self._topology
+
+    @staticmethod
+    def from_triangles(triangles):
+        vertices, faces = Mesh.index_triangles(triangles)
+        return Mesh(Mesh.gather_positions(vertices), faces)
+
+    @staticmethod
+    def index_triangles(triangles):
+        # Vertices are shared by identity, the same way the renderer shares them
+        index = {}
+        faces = []
+        for triangle in triangles:
+            face = []
+            for vertex in (triangle.a, triangle.b, triangle.c):
+                if vertex not in index:
+                    index[vertex] = len(index)
+                face.append(index[vertex])
+            faces.append(face)
+        return list(index), faces
+
+    @staticmethod
+    def gather_positions(vertices):
+        return [(vertex.x, vertex.y, getattr(vertex, 'z', 0.0)) for vertex in vertices]
+
+    @staticmethod
+    def from_shape(shape):
+        return Mesh.from_triangles(getattr(shape, 'triangles', [shape]))
+
+    def corners(self):
+        a, b, c = self._corner_axes()
+        return a.T, b.T, c.T
+
+    def _axes(self):
+        # Vertex coordinates as contiguous x, y and z rows. np.take on these gathers
+        # several times faster than indexing (V, 3) rows, and keeps the component
+        # arithmetic on what it gathers contiguous too.
+        return np.ascontiguousarray(self.vertices.T)
+
+    def _corner_axes(self, axes=None):
+        # The three corners of every face, each as a (3, N) array of x, y and z rows
+        gathered = np.take(self._axes() if axes is None else axes, self.faces.T, axis=1)
+        return gathered[:, 0], gathered[:, 1], gathered[:, 2]
+
+    @staticmethod
+    def _normals(a, b, c):
+        # Cross product of the edges by explicit components, (3, N); faster than np.cross
+        u, w = b - a, c - a
+        normals = np.empty_like(u)
+        scratch = np.empty_like(u[0])
+        for i, j, k in ((0, 1, 2), (1, 2, 0), (2, 0, 1)):
+            np.multiply(u[j], w[k], out=normals[i])
+            np.multiply(u[k], w[j], out=scratch)
+            normals[i] -= scratch
+        return normals
+
+    def face_normals(self):
+        # Not normalized: the length of each normal is twice the triangle area
+        return self._normals(*self._corner_axes()).T
+
+    def triangle_areas(self):
+        return self._triangle_areas(self._normals(*self._corner_axes()))
+
+    def area(self):
+        return float(self.triangle_areas().sum())
+
+    def volume(self):
+        a, b, c = self._corner_axes()
+        return self._volume(a, self._normals(a, b, c))
+
+    def centroid(self):
+        a, b, c = self._corner_axes()
+        return self._centroid(a, b, c, self._triangle_areas(self._normals(a, b, c)))
+
+    def metrics(self):
+        # Everything at once, from a single gather of the corners and one cross product
+        axes = self._axes()
+        a, b, c = self._corner_axes(axes)
+        normals = self._normals(a, b, c)
+        areas = self._triangle_areas(normals)
+        return {
+            'area': float(areas.sum()),
+            'volume': self._volume(a, normals),
+            'centroid': self._centroid(a, b, c, areas),
+            'bounding_box': self.bounding_box(axes),
+            'perimeter': self._boundary_length(a, b, c)
+        }
+
+    def _boundary_length(self, a, b, c):
+        # The perimeter from corners already gathered: half-edge k of a face runs from
+        # corner k to the next, and boundary edges have exactly one half-edge
+        topology = self.topology
+        boundary = topology.boundary[topology.halfedge_edge].reshape(-1, 3).T
+        total = 0.0
+        for start, end, on_boundary in zip((a, b, c), (b, c, a), boundary):
+            delta = end - start
+            total += float(np.sqrt(np.einsum('ij,ij->j', delta, delta)).sum(where=on_boundary))
+        return total
+
+    @staticmethod
+    def _triangle_areas(normals):
+        return 0.5 * np.sqrt(np.einsum('ij,ij->j', normals, normals))
+
+    @staticmethod
+    def _volume(a, normals):
+        # Divergence theorem: sum of signed tetrahedra against the origin, a . (b x c),
+        # which equals a . ((b - a) x (c - a)). Only meaningful for closed meshes with
+        # consistently oriented faces.
+        return abs(float(np.einsum('ij,ij->', a, normals))) / 6
+
+    def _centroid(self, a, b, c, areas):
+        # Area-weighted centroid of the surface
+        total = areas.sum()
+        if total == 0:
+            return self.vertices.mean(axis=0)
+        corner_sum = a + b
+        corner_sum += c
+        return corner_sum @ areas / (3 * total)
+
+    def bounding_box(self, axes=None):
+        axes = self._axes() if axes is None else axes
+        return axes.min(axis=1), axes.max(axis=1)
+
+    def edge_lengths(self, edges=None, axes=None):
+        edges = self.topology.edges if edges is None else self.topology.edges[edges]
+        ends = np.take(self._axes() if axes is None else axes, edges.T, axis=1)
+        deltas = ends[:, 1] - ends[:, 0]
+        return np.sqrt(np.einsum('ij,ij->j', deltas, deltas))
+
+    def perimeter(self, axes=None):
+        # Total length of the edges used by exactly one face
+        return float(self.edge_lengths(self.topology.boundary_edges(), axes).sum())
+
+    def silhouette_edges(self, view_direction):
+        # Edges between a front- and a back-facing triangle, plus open boundaries
+        topology = self.topology
+        facing = self.face_normals() @ np.asarray(view_direction, dtype=np.float64) < 0
+        first, second = topology.edge_faces[:, 0], topology.edge_faces[:, 1]
+        interior = second >= 0
+        silhouette = topology.boundary.copy()
+        silhouette[interior] = facing[first[interior]] != facing[second[interior]]
+        return np.flatnonzero(silhouette)
+
+    def weld(self, tolerance=1e-9):
+        # Merged corners can collapse triangles, those are dropped
+        positions, remap = Mesh.weld_positions(self.vertices, tolerance)
+        faces = remap[self.faces]
+        keep = (faces[:, 0] != faces[:, 1]) & (faces[:, 1] != faces[:, 2]) & (faces[:, 2] != faces[:, 0])
+        return Mesh(positions, faces[keep])
+
+    @staticmethod
+    def weld_positions(positions, tolerance=1e-9):
+        # Each position merges into the first earlier kept position within tolerance, or
+        # is kept itself. Returns the kept positions and, for every input position, the
+        # index it was merged into.
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+        tolerance = max(tolerance, 1e-12)
+        earlier, later = Mesh._weld_pairs(positions, tolerance)
+        target = Mesh._weld_targets(len(positions), earlier, later)
+        kept = np.flatnonzero(target == np.arange(len(positions)))
+        rank = np.empty(len(positions), dtype=np.int64)
+        rank[kept] = np.arange(len(kept))
+        return positions[kept], rank[target]
+
+    @staticmethod
+    def _weld_pairs(positions, tolerance):
+        # Spatial hash: anything within tolerance of a point lies in its own grid cell or
+        # one of the 26 around it, when cells are at least a tolerance wide. They are
+        # widened past that only as far as needed to pack a cell into one integer key.
+        # The last row of cells on each axis stays empty, so a neighbor key that wraps
+        # into the next row never matches. Points are grouped by sorting the keys, and
+        # since a neighbor's key is the cell's plus a constant, the lookups for every
+        # cell are sorted too. Returns every pair of positions within tolerance as
+        # (earlier index, later index).
+        count = len(positions)
+        if not count:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        low = positions.min(axis=0)
+        width = max(tolerance, float((positions.max(axis=0) - low).max()) / (WELD_GRID - 2))
+        cells = np.minimum(np.floor((positions - low) / width).astype(np.int64), WELD_GRID - 2)
+        keys = (cells[:, 0] * WELD_GRID + cells[:, 1]) * WELD_GRID + cells[:, 2]
+        order = np.argsort(keys, kind='stable')
+        keys = keys[order]
+        first = np.concatenate(([True], keys[1:] != keys[:-1]))
+        group = np.cumsum(first) - 1
+        group_start = np.flatnonzero(first)
+        group_end = np.append(group_start[1:], count)
+        group_keys = keys[group_start]
+        tolerance_sq = tolerance * tolerance
+
+        earlier, later = [], []
+        for dx, dy, dz in WELD_OFFSETS:
+            if (dx, dy, dz) == (0, 0, 0):
+                # The rest of a point's own cell, after it in sorted order
+                points = np.arange(count)
+                first, last = points + 1, group_end[group]
+            else:
+                neighbor = group_keys + (dx * WELD_GRID + dy) * WELD_GRID + dz
+                slot = np.minimum(np.searchsorted(group_keys, neighbor), len(group_keys) - 1)
+                found = group_keys[slot] == neighbor
+                points = np.flatnonzero(found[group])
+                first, last = group_start[slot[group[points]]], group_end[slot[group[points]]]
+            counts = last - first
+            nonempty = counts > 0
+            points, first, counts = points[nonempty], first[nonempty], counts[nonempty]
+            if not len(points):
+                continue
+
+            # Candidate pairs in blocks, so a crowded cell cannot blow up the temporaries
+            cuts = np.searchsorted(np.cumsum(counts), np.arange(WELD_BLOCK, counts.sum(), WELD_BLOCK))
+            for block_points, block_first, block_counts in zip(np.split(points, cuts), np.split(first, cuts),
+                                                               np.split(counts, cuts)):
+                a = order[np.repeat(block_points, block_counts)]
+                b = order[np.repeat(block_first, block_counts) + _ranges(block_counts)]
+                delta = positions[a] - positions[b]
+                close = np.einsum('ij,ij->i', delta, delta) <= tolerance_sq
+                earlier.append(np.minimum(a[close], b[close]))
+                later.append(np.maximum(a[close], b[close]))
+
+        if not earlier:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        return np.concatenate(earlier), np.concatenate(later)
+
+    @staticmethod
+    def _weld_targets(count, earlier, later):
+        # Index every position merges into, itself if kept. A position can be decided once
+        # the first of its earlier neighbors not merged away is decided: merged into it if
+        # kept, and kept if there is none. Rounds settle every position whose earlier
+        # neighbors were settled before; chains that take many rounds (points spaced just
+        # under the tolerance along a line) are finished one position at a time.
+        target = np.arange(count)
+        merged = np.zeros(count, dtype=bool)
+        settled = np.ones(count, dtype=bool)
+        if not len(later):
+            return target
+
+        pair_order = np.lexsort((earlier, later))
+        earlier, later = earlier[pair_order], later[pair_order]
+        starts = np.flatnonzero(np.concatenate(([True], later[1:] != later[:-1])))
+        ends = np.append(starts[1:], len(later))
+        points = later[starts]
+        settled[points] = False
+        pending = np.arange(len(points))
+        positions = np.arange(len(later))
+
+        for _ in range(WELD_ROUNDS):
+            if not len(pending):
+                return target
+            live = np.where(merged[earlier], len(later), positions)
+            first_live = np.minimum.reduceat(live, starts)[pending]
+            none = first_live == len(later)
+            candidate = earlier[np.where(none, 0, first_live)]
+            merge = ~none & settled[candidate] & ~merged[candidate]
+            decided = none | merge
+            merged[points[pending[merge]]] = True
+            target[points[pending[merge]]] = candidate[merge]
+            settled[points[pending[decided]]] = True
+            pending = pending[~decided]
+
+        earlier_list = earlier.tolist()
+        for group, start, end in zip(pending.tolist(), starts[pending].tolist(), ends[pending].tolist()):
+            point = points[group]
+            for k in earlier_list[start:end]:
+                if not merged[k]:
+                    merged[point] = True
+                    target[point] = k
+                    break
+        return target
+
+    def __str__(self):
+        return f'Mesh({len(self.vertices)} vertices, {len(self.faces)} faces)'
+
+class MeshTopology:
+    def __init__(self, faces, vertex_count):
+        faces = np.asarray(faces, dtype=np.int64).reshape(-1, 3)
+        self.vertex_count = vertex_count
+        self.face_count = len(faces)
+
+        # Half-edge h runs from corner h % 3 to the next corner of face h // 3
+        self.halfedge_origin = faces.ravel()
+        self.halfedge_target = np.roll(faces, -1, axis=1).ravel()
+        low = np.minimum(self.halfedge_origin, self.halfedge_target)
+        high = np.maximum(self.halfedge_origin, self.halfedge_target)
+
+        # One sort groups the half-edges of every undirected edge together
+        halfedge_keys = low * vertex_count + high
+        order = np.argsort(halfedge_keys, kind='stable')
+        sorted_keys = halfedge_keys[order]
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = sorted_keys[1:] != sorted_keys[:-1]
+        starts = np.flatnonzero(first)
+        counts = np.diff(np.append(starts, len(order)))
+        self.halfedge_edge = np.empty(len(order), dtype=np.int64)
+        self.halfedge_edge[order] = np.cumsum(first) - 1
+        self.edges = np.stack(np.divmod(sorted_keys[starts], vertex_count), axis=1)
+        self.boundary = counts == 1
+        self.manifold = counts <= 2
+
+        self.edge_halfedge = order[starts]
+        self.twin = np.full(len(order), -1, dtype=np.int64)
+        paired = starts[counts == 2]
+        self.twin[order[paired]] = order[paired + 1]
+        self.twin[order[paired + 1]] = order[paired]
+
+        # Faces on either side of each edge, -1 where there is none
+        edge_count = len(starts)
+        self.edge_faces = np.full((edge_count, 2), -1, dtype=np.int64)
+        self.edge_faces[:, 0] = self.edge_halfedge // 3
+        twins = self.twin[self.edge_halfedge]
+        self.edge_faces[twins >= 0, 1] = twins[twins >= 0] // 3
+        self.face_neighbors = np.where(self.twin >= 0, self.twin // 3, -1).reshape(-1, 3)
+
+        # CSR vertex adjacency: neighbors of v are indices[indptr[v]:indptr[v + 1]]
+        sources = np.concatenate((self.edges[:, 0], self.edges[:, 1]))
+        targets = np.concatenate((self.edges[:, 1], self.edges[:, 0]))
+        edge_ids = np.concatenate((np.arange(edge_count), np.arange(edge_count)))
+        order = np.argsort(sources, kind='stable')
+        self.indices = targets[order]
+        self.neighbor_edges = edge_ids[order]
+        self.indptr = np.concatenate(([0], np.cumsum(np.bincount(sources, minlength=vertex_count))))
+
+    def next_halfedge(self, halfedge):
+        return halfedge - halfedge % 3 + (halfedge % 3 + 1) % 3
+
+    def edge_vertices(self, edge):
+        return self.edges[edge]
+
+    def is_boundary(self, edge):
+        return bool(self.boundary[edge])
+
+    def boundary_edges(self):
+        return np.flatnonzero(self.boundary)
+
+    def neighbors_of_face(self, face):
+        return self.face_neighbors[face]
+
+    def vertex_neighbors(self, vertex):
+        return self.indices[self.indptr[vertex]:self.indptr[vertex + 1]]
+
+    def vertex_edges(self, vertex):
+        return self.neighbor_edges[self.indptr[vertex]:self.indptr[vertex + 1]]
+
+    def find_edge(self, a, b):
+        start, end = self.indptr[a], self.indptr[a + 1]
+        hits = np.flatnonzero(self.indices[start:end] == b)
+        return int(self.neighbor_edges[start + hits[0]]) if len(hits) else -1
+
+    def __str__(self):
+        return f'MeshTopology({len(self.edges)} edges, {int(self.boundary.sum())} boundary)'
+
 class ShapeFactory:
     @staticmethod
     def create_cube(center, side_length):
@@ -158,18 +656,253 @@ class ShapeFactory:
         return CustomShape(triangles)
 
 
+    @staticmethod
+    def _grid_faces(rows, columns, wrap_columns=False, wrap_rows=False):
+        # Two triangles per cell of a rows x columns vertex grid, optionally wrapping around
+        row_count = rows if wrap_rows else rows - 1
+        column_count = columns if wrap_columns else columns - 1
+        r, c = np.meshgrid(np.arange(row_count), np.arange(column_count), indexing='ij')
+        r, c = r.ravel(), c.ravel()
+        r1, c1 = (r + 1) % rows, (c + 1) % columns
+        a, b, d, e = r * columns + c, r * columns + c1, r1 * columns + c, r1 * columns + c1
+        return np.concatenate((np.stack((a, b, d), axis=1), np.stack((b, e, d), axis=1)))
+
+    @staticmethod
+    def create_uv_sphere(center, radius, resolution):
+        rings, segments = max(resolution, 2), max(2 * resolution, 3)
+        theta = np.linspace(0, np.pi, rings + 1)[1:-1]
+        phi = np.linspace(0, 2 * np.pi, segments, endpoint=False)
+        theta, phi = np.meshgrid(theta, phi, indexing='ij')
+        body = np.stack((np.sin(theta) * np.cos(phi), np.cos(theta), np.sin(theta) * np.sin(phi)), axis=-1)
+        vertices = np.concatenate(([(0, 1, 0)], body.reshape(-1, 3), [(0, -1, 0)]))
+
+        ring = np.arange(segments)
+        bottom = 1 + (rings - 2) * segments
+        faces = np.concatenate((
+            np.stack((np.zeros(segments, dtype=np.int64), 1 + (ring + 1) % segments, 1 + ring), axis=1),
+            1 + ShapeFactory._grid_faces(rings - 1, segments, wrap_columns=True),
+            np.stack((np.full(segments, len(vertices) - 1), bottom + ring, bottom + (ring + 1) % segments), axis=1)
+        ))
+        return Mesh(vertices * radius + (center.x, center.y, center.z), faces)
+
+    @staticmethod
+    def create_ico_sphere(center, radius, subdivisions):
+        t = (1 + 5 ** 0.5) / 2
+        vertices = np.array([(-1, t, 0), (1, t, 0), (-1, -t, 0), (1, -t, 0), (0, -1, t), (0, 1, t),
+                             (0, -1, -t), (0, 1, -t), (t, 0, -1), (t, 0, 1), (-t, 0, -1), (-t, 0, 1)], dtype=np.float64)
+        faces = np.array([(0, 11, 5), (0, 5, 1), (0, 1, 7), (0, 7, 10), (0, 10, 11), (1, 5, 9), (5, 11, 4),
+                          (11, 10, 2), (10, 7, 6), (7, 1, 8), (3, 9, 4), (3, 4, 2), (3, 2, 6), (3, 6, 8),
+                          (3, 8, 9), (4, 9, 5), (2, 4, 11), (6, 2, 10), (8, 6, 7), (9, 8, 1)], dtype=np.int64)
+        vertices /= np.linalg.norm(vertices, axis=1)[:, None]
+
+        for _ in range(subdivisions):
+            # Every edge gets one midpoint; half-edge h of a face runs from corner h % 3
+            topology = MeshTopology(faces, len(vertices))
+            midpoints = vertices[topology.edges[:, 0]] + vertices[topology.edges[:, 1]]
+            midpoints /= np.linalg.norm(midpoints, axis=1)[:, None]
+            mid = (len(vertices) + topology.halfedge_edge).reshape(-1, 3)
+            a, b, c = faces[:, 0], faces[:, 1], faces[:, 2]
+            ab, bc, ca = mid[:, 0], mid[:, 1], mid[:, 2]
+            faces = np.concatenate((np.stack((a, ab, ca), axis=1), np.stack((b, bc, ab), axis=1),
+                                    np.stack((c, ca, bc), axis=1), np.stack((ab, bc, ca), axis=1)))
+            vertices = np.concatenate((vertices, midpoints))
+
+        return Mesh(vertices * radius + (center.x, center.y, center.z), faces)
+
+    @staticmethod
+    def create_torus(center, major_radius, minor_radius, resolution):
+        rings, sides = max(2 * resolution, 3), max(resolution, 3)
+        u = np.linspace(0, 2 * np.pi, rings, endpoint=False)
+        v = np.linspace(0, 2 * np.pi, sides, endpoint=False)
+        u, v = np.meshgrid(u, v, indexing='ij')
+        distance = major_radius + minor_radius * np.cos(v)
+        vertices = np.stack((distance * np.cos(u), minor_radius * np.sin(v), distance * np.sin(u)), axis=-1)
+        faces = ShapeFactory._grid_faces(rings, sides, wrap_columns=True, wrap_rows=True)
+        return Mesh(vertices.reshape(-1, 3) + (center.x, center.y, center.z), faces)
+
+    @staticmethod
+    def create_cylinder(center, radius, height, resolution, capped=True):
+        segments = max(resolution, 3)
+        phi = np.linspace(0, 2 * np.pi, segments, endpoint=False)
+        ring = np.stack((radius * np.cos(phi), np.zeros(segments), radius * np.sin(phi)), axis=1)
+        vertices = np.concatenate((ring + (0, height / 2, 0), ring - (0, height / 2, 0)))
+        faces = ShapeFactory._grid_faces(2, segments, wrap_columns=True)
+        if capped:
+            index = np.arange(segments)
+            top, bottom = 2 * segments, 2 * segments + 1
+            vertices = np.concatenate((vertices, [(0, height / 2, 0), (0, -height / 2, 0)]))
+            faces = np.concatenate((
+                faces,
+                np.stack((np.full(segments, top), (index + 1) % segments, index), axis=1),
+                np.stack((np.full(segments, bottom), segments + index, segments + (index + 1) % segments), axis=1)
+            ))
+        return Mesh(vertices + (center.x, center.y, center.z), faces)
+
+    @staticmethod
+    def create_height_field(center, heights, cell_size=1.0):
+        # heights[row, column] becomes the y coordinate of a grid in the x/z plane
+        heights = np.asarray(heights, dtype=np.float64)
+        rows, columns = heights.shape
+        z, x = np.meshgrid((np.arange(rows) - (rows - 1) / 2) * cell_size,
+                           (np.arange(columns) - (columns - 1) / 2) * cell_size, indexing='ij')
+        vertices = np.stack((x, heights, z), axis=-1).reshape(-1, 3)
+        # Reversed so the faces point up, towards +y
+        faces = ShapeFactory._grid_faces(rows, columns)[:, ::-1]
+        return Mesh(vertices + (center.x, center.y, center.z), faces)
+
+    @staticmethod
+    def weld(shape, tolerance=1e-9):
+        # Makes triangles share one Point3D per position so the renderer transforms
+        # and projects each position once. Updates the shape in place.
+        corners = [vertex for triangle in shape.triangles for vertex in (triangle.a, triangle.b, triangle.c)]
+        positions, remap = Mesh.weld_positions([(v.x, v.y, v.z) for v in corners], tolerance)
+        points = [Point3D(*position) for position in positions.tolist()]
+        shape.triangles = [Triangle(points[remap[i]], points[remap[i + 1]], points[remap[i + 2]])
+                           for i in range(0, len(corners), 3)]
+        return shape
+
     @staticmethod
     def create_cube_custom(vertices):
         if len(vertices) != 8:
             raise ValueError("A cube must have 8 vertices")
         return Cube(vertices)
 
+class Camera:
+    def __init__(self, width, height, focal_length=200, perspective_enabled=True, near=1.0):
+        self.width = width
+        self.height = height
+        self._focal_length = focal_length
+        self._perspective_enabled = perspective_enabled
+        # Points closer to the eye than this, in view space, are not projected
+        self.near = near
+        # Screen pixels per world unit at the focal plane, below 1 when rendering downscaled
+        self.pixel_scale = 1.0
+        self.rotation_angles = (0, 0, 0)
+        self._view = None
+        self._projection = None
+        self._model_view_projection = None
+
+    @property
+    def focal_length(self):
+        return self._focal_length
+
+    @focal_length.setter
+    def focal_length(self, value):
+        self._focal_length = value
+        self._invalidate_projection()
+
+    @property
+    def perspective_enabled(self):
+        return self._perspective_enabled
+
+    @perspective_enabled.setter
+    def perspective_enabled(self, value):
+        self._perspective_enabled = value
+        self._invalidate_projection()
+
+    def adjust_focal_length(self, amount):
+        self.focal_length += amount
+
+    def toggle_perspective(self):
+        self.perspective_enabled = not self.perspective_enabled
+
+    def set_viewport(self, width, height, pixel_scale=1.0):
+        if (width, height, pixel_scale) != (self.width, self.height, self.pixel_scale):
+            self.width, self.height, self.pixel_scale = width, height, pixel_scale
+            self._invalidate_projection()
+
+    def set_rotation(self, angles):
+        # Accepts the Transformer's {'x', 'y', 'z'} dict or an (x, y, z) tuple of degrees
+        if isinstance(angles, dict):
+            angles = (angles['x'], angles['y'], angles['z'])
+        angles = tuple(angles)
+        if angles != self.rotation_angles:
+            self.rotation_angles = angles
+            self._view = None
+            self._model_view_projection = None
+
+    def _invalidate_projection(self):
+        self._projection = None
+        self._model_view_projection = None
+
+    @staticmethod
+    def rotation_matrix(x, y, z):
+        # Same order as Transformer.apply_rotation: about x, then y, then z
+        rx, ry, rz = math.radians(x), math.radians(y), math.radians(z)
+        cx, sx, cy, sy, cz, sz = math.cos(rx), math.sin(rx), math.cos(ry), math.sin(ry), math.cos(rz), math.sin(rz)
+        rotate_x = np.array([[1, 0, 0], [0, cx, -sx], [0, sx, cx]])
+        rotate_y = np.array([[cy, 0, sy], [0, 1, 0], [-sy, 0, cy]])
+        rotate_z = np.array([[cz, -sz, 0], [sz, cz, 0], [0, 0, 1]])
+        return rotate_z @ rotate_y @ rotate_x
+
+    def view_matrix(self):
+        if self._view is None:
+            self._view = np.identity(4)
+            self._view[:3, :3] = Camera.rotation_matrix(*self.rotation_angles)
+        return self._view
+
+    def projection_matrix(self):
+        # Maps view space straight to pixel coordinates, the viewport transform of
+        # Display.to_screen included. w is the distance in front of the eye.
+        if self._projection is None:
+            half_width, half_height, scale = self.width / 2, self.height / 2, self.pixel_scale
+            if self.perspective_enabled:
+                f = self.focal_length
+                self._projection = np.array([[scale * f, 0, half_width, half_width * f],
+                                             [0, -scale * f, half_height, half_height * f],
+                                             [0, 0, 1, 0],
+                                             [0, 0, 1, f]], dtype=np.float64)
+            else:
+                self._projection = np.array([[scale, 0, 0, half_width],
+                                             [0, -scale, 0, half_height],
+                                             [0, 0, 1, 0],
+                                             [0, 0, 0, 1]], dtype=np.float64)
+        return self._projection
+
+    def model_view_projection(self):
+        if self._model_view_projection is None:
+            self._model_view_projection = self.projection_matrix() @ self.view_matrix()
+        return self._model_view_projection
+
+    def project(self, points):
+        return self._project(points, self.model_view_projection())
+
+    def project_view(self, points):
+        # For points that are already rotated into view space
+        return self._project(points, self.projection_matrix())
+
+    def _project(self, points, matrix):
+        # Returns integer screen coordinates and a mask of the points in front of the near plane
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        clip = points @ matrix[:, :3].T + matrix[:, 3]
+        w = clip[:, 3]
+        visible = w > self.near if self.perspective_enabled else np.ones(len(points), dtype=bool)
+        w = np.where(visible, w, 1.0)
+        screen = (clip[:, :2] / w[:, None]).astype(np.int64)
+        screen[~visible] = 0
+        return screen, visible
+
 class Display:
     def __init__(self, width, height):
         self.width = width
         self.height = height
-        self.focal_length = 200
-        self.perspective_enabled = True
+        self.camera = Camera(width, height)
+
+    @property
+    def focal_length(self):
+        return self.camera.focal_length
+
+    @focal_length.setter
+    def focal_length(self, value):
+        self.camera.focal_length = value
+
+    @property
+    def perspective_enabled(self):
+        return self.camera.perspective_enabled
+
+    @perspective_enabled.setter
+    def perspective_enabled(self, value):
+        self.camera.perspective_enabled = value
 
     def to_screen(self, point):
         return int(point.x + self.width / 2), int(self.height / 2 - point.y)
@@ -183,8 +916,11 @@ class Display:
         y = point3d.y * factor
         return Vertices(x, y)
 
+    def project_array(self, points):
+        return self.camera.project(points)
+
     def adjust_focal_length(self, amount):
-        self.focal_length += amount
+        self.camera.adjust_focal_length(amount)
 
     def toggle_perspective(self):
-        self.perspective_enabled = not self.perspective_enabled
\ No newline at end of file
+        self.camera.toggle_perspective()
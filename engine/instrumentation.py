@@ -0,0 +1,187 @@
+import gc
+import linecache
+import os
+import time
+import tracemalloc
+from collections import defaultdict
+
+
+class FrameAllocations:
+    def __init__(self, index, frame_time, peak, size, count, sites, gc_pauses, transient_sites=(), sample_time=0.0):
+        self.index = index
+        # Without the time sample() took, which is kept in sample_time
+        self.frame_time = frame_time
+        self.sample_time = sample_time
+        # Highest traced memory during the frame above where it started, catching short lived
+        # allocations that are gone again by the end of the frame
+        self.peak = peak
+        # Net bytes and blocks still allocated at the end of the frame, compared to the previous one
+        self.size = size
+        self.count = count
+        # [(filename, lineno, size_diff, count_diff)], largest first. Only memory still held at
+        # the end of the frame shows up here; temporaries freed within it do not.
+        self.sites = sites
+        # Same layout, for memory held above the frame's start at the sample points inside
+        # the frame (see AllocationTracker.sample), which is where the temporaries show up.
+        # These are lower bounds: temporaries created and freed between two sample points
+        # are missed, and a site's figure is the most it held at any one of them.
+        self.transient_sites = list(transient_sites)
+        # [(generation, seconds paused, objects collected)]
+        self.gc_pauses = gc_pauses
+
+    @property
+    def gc_time(self):
+        return sum(pause for _, pause, _ in self.gc_pauses)
+
+
+class AllocationTracker:
+    def __init__(self, top=10, traceback_depth=1, history=600, samples_per_frame=4):
+        # Call sites kept per frame
+        self.top = top
+        self.traceback_depth = traceback_depth
+        # Frames kept for the report; older ones are dropped
+        self.history = history
+        # Snapshots sample() takes at most per frame; each costs about as much as end_frame
+        self.samples_per_frame = samples_per_frame
+        self.frames = []
+        self.frame_index = 0
+        self.started_tracemalloc = False
+        self._snapshot = None
+        self._gc_start = None
+        self._gc_pauses = []
+        self._frame_base = 0
+        self._peak = 0
+        self._samples = 0
+        self._transient = {}
+        # Seconds spent in sample() so far this frame, for the caller to take out of its timings
+        self.sample_time = 0.0
+        # Our own bookkeeping shows up in the snapshots otherwise
+        self._filters = [tracemalloc.Filter(False, tracemalloc.__file__),
+                         tracemalloc.Filter(False, linecache.__file__),
+                         tracemalloc.Filter(False, __file__)]
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.traceback_depth)
+            self.started_tracemalloc = True
+        gc.callbacks.append(self._gc_callback)
+        self._snapshot = self._take_snapshot()
+        self._reset_peak()
+
+    def stop(self):
+        if self._gc_callback in gc.callbacks:
+            gc.callbacks.remove(self._gc_callback)
+        if self.started_tracemalloc:
+            tracemalloc.stop()
+            self.started_tracemalloc = False
+        self._snapshot = None
+
+    def _take_snapshot(self):
+        return tracemalloc.take_snapshot().filter_traces(self._filters)
+
+    def _reset_peak(self):
+        tracemalloc.reset_peak()
+        self._frame_base = self._peak = tracemalloc.get_traced_memory()[0]
+
+    def _gc_callback(self, phase, info):
+        if phase == 'start':
+            self._gc_start = time.perf_counter()
+        elif self._gc_start is not None:
+            self._gc_pauses.append((info['generation'], time.perf_counter() - self._gc_start, info['collected']))
+            self._gc_start = None
+
+    def sample(self):
+        # Call from inside the frame's hot path while its temporaries are still alive. Records,
+        # per call site, the memory held above the start of the frame.
+        if self._snapshot is None or self._samples >= self.samples_per_frame:
+            return
+        start = time.perf_counter()
+        self._samples += 1
+        # The snapshot itself would count toward the frame's peak otherwise
+        self._peak = max(self._peak, tracemalloc.get_traced_memory()[1])
+        for stat in self._take_snapshot().compare_to(self._snapshot, 'lineno'):
+            if stat.size_diff > 0:
+                frame = stat.traceback[0]
+                key = (frame.filename, frame.lineno)
+                if stat.size_diff > self._transient.get(key, (0, 0))[0]:
+                    self._transient[key] = (stat.size_diff, stat.count_diff)
+        tracemalloc.reset_peak()
+        self.sample_time += time.perf_counter() - start
+
+    def end_frame(self, frame_time):
+        # Call once per frame, after the frame's work and outside of its timing. frame_time
+        # should not include sample_time.
+        if self._snapshot is None:
+            return None
+        peak = max(self._peak, tracemalloc.get_traced_memory()[1]) - self._frame_base
+        snapshot = self._take_snapshot()
+        differences = snapshot.compare_to(self._snapshot, 'lineno')
+        self._snapshot = snapshot
+
+        sites = []
+        size = count = 0
+        for stat in differences:
+            size += stat.size_diff
+            count += stat.count_diff
+            if stat.size_diff > 0 and len(sites) < self.top:
+                frame = stat.traceback[0]
+                sites.append((frame.filename, frame.lineno, stat.size_diff, stat.count_diff))
+
+        transient = sorted(self._transient.items(), key=lambda item: item[1][0], reverse=True)[:self.top]
+        transient = [(filename, lineno, size, count) for (filename, lineno), (size, count) in transient]
+        record = FrameAllocations(self.frame_index, frame_time, peak, size, count, sites, self._gc_pauses, transient,
+                                  self.sample_time)
+        self._gc_pauses = []
+        self._transient = {}
+        self._samples = 0
+        self.sample_time = 0.0
+        self.frame_index += 1
+        self.frames.append(record)
+        if len(self.frames) > self.history:
+            del self.frames[0]
+        self._reset_peak()
+        return record
+
+    def hot_sites(self, limit=None, transient=False):
+        # Call sites ranked by bytes they retained over all recorded frames, or with transient
+        # by bytes they held mid-frame at the sample points
+        totals = defaultdict(lambda: [0, 0])
+        for record in self.frames:
+            for filename, lineno, size, count in (record.transient_sites if transient else record.sites):
+                totals[(filename, lineno)][0] += size
+                totals[(filename, lineno)][1] += count
+        ranked = sorted(totals.items(), key=lambda item: item[1][0], reverse=True)
+        return [(filename, lineno, size, count) for (filename, lineno), (size, count) in ranked[:limit or self.top]]
+
+    def report(self):
+        if not self.frames:
+            return "No frames recorded"
+        frames = len(self.frames)
+        average_time = sum(record.frame_time for record in self.frames) / frames
+        average_sample_time = sum(record.sample_time for record in self.frames) / frames
+        with_gc = [record for record in self.frames if record.gc_pauses]
+        lines = [
+            f"Frames: {frames}, average frame time {average_time * 1000:.2f} ms "
+            f"(plus {average_sample_time * 1000:.2f} ms of mid-frame sampling, left out)",
+            f"Allocated per frame: {sum(record.size for record in self.frames) / frames:.0f} bytes, "
+            f"{sum(record.count for record in self.frames) / frames:.1f} blocks (net), "
+            f"peak {max(record.peak for record in self.frames)} bytes above frame start",
+        ]
+        if with_gc:
+            pauses = [pause for record in with_gc for _, pause, _ in record.gc_pauses]
+            gc_frame_time = sum(record.frame_time for record in with_gc) / len(with_gc)
+            lines.append(f"GC: {len(pauses)} collections in {len(with_gc)} frames, "
+                         f"longest pause {max(pauses) * 1000:.2f} ms, "
+                         f"frames with GC average {gc_frame_time * 1000:.2f} ms")
+        else:
+            lines.append("GC: no collections")
+        for title, transient in (("Top allocation sites held mid-frame (temporaries, lower bounds):", True),
+                                 ("Top allocation sites retained at frame end:", False)):
+            sites = self.hot_sites(transient=transient)
+            if not sites:
+                continue
+            lines.append(title)
+            for filename, lineno, size, count in sites:
+                lines.append(f"  {os.path.relpath(filename)}:{lineno}: {size / frames:.0f} bytes, "
+                             f"{count / frames:.1f} blocks per frame")
+        return "\n".join(lines)
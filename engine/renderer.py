@@ -1,11 +1,24 @@
 import pygame
 import math
-from engine.geometry import Display, ShapeFactory, Point3D
+import time
+import weakref
+from contextlib import contextmanager
+from engine.geometry import Display, Mesh, ShapeFactory, Point3D
+from engine.scene import SceneNode
+from engine.framebus import FramePublisher
+from engine.instrumentation import AllocationTracker
 import re
 import random
 import re
 
 
+# Advances are in em units, i.e. multiples of font_size
+DEFAULT_ADVANCE = 0.8
+GLYPH_SPACING = 0.15
+ATLAS_PADDING = 2
+ATLAS_MAX_WIDTH = 1024
+
+
 class STF:
     def __init__(self, font_file, font_size):
         self.font_size = font_size
@@ -51,8 +64,30 @@ class STF:
                 'connections': current_connections
             }
 
+        for char_data in characters.values():
+            char_data['bounds'], char_data['advance'] = self.compute_metrics(char_data['points'])
+
         return characters
 
+    @staticmethod
+    def compute_metrics(points):
+        if not points:
+            return None, DEFAULT_ADVANCE
+        xs = [x for x, _ in points.values()]
+        ys = [y for _, y in points.values()]
+        bounds = (min(xs), min(ys), max(xs), max(ys))
+        return bounds, bounds[2] + GLYPH_SPACING
+
+    def get_bounds(self, char):
+        if char not in self.characters:
+            return None
+        return self.characters[char]['bounds']
+
+    def get_advance(self, char):
+        if char not in self.characters:
+            return DEFAULT_ADVANCE
+        return self.characters[char]['advance']
+
     def get_character_shape(self, char):
         if char not in self.characters:
             return []
@@ -82,9 +117,118 @@ class STF:
             print("---")
 
 
+class GlyphAtlas:
+    def __init__(self, surface, glyphs, advances, top, bottom):
+        self.surface = surface
+        # char -> (area in the atlas surface, pen offset x, pen offset y)
+        self.glyphs = glyphs
+        self.advances = advances
+        # Vertical extent of any glyph relative to the pen position
+        self.top = top
+        self.bottom = bottom
+
+    def measure(self, text, default_advance):
+        return sum(self.advances.get(char, default_advance) for char in text)
+
+
+class HudLayer:
+    def __init__(self, position=(10, 10), line_spacing=1.5, refresh_interval=0.25, time_source=time.perf_counter):
+        self.position = position
+        self.line_spacing = line_spacing
+        # Seconds between rebuilding the text; changed lines are re-rasterized, the rest reused
+        self.refresh_interval = refresh_interval
+        self.time_source = time_source
+        self.surface = None
+        self.offset = position
+        self.lines = []
+        self.line_surfaces = {}
+        self.atlas = None
+        self.last_refresh = None
+
+    def expire(self):
+        # Refresh on the next frame, e.g. after a key press changed what is shown
+        self.last_refresh = None
+
+    def needs_refresh(self):
+        return (self.last_refresh is None
+                or self.time_source() - self.last_refresh >= self.refresh_interval)
+
+    def update(self, renderer, lines):
+        self.last_refresh = self.time_source()
+        atlas = renderer.get_font_atlas()
+        if atlas is not self.atlas:
+            self.atlas = atlas
+            self.line_surfaces = {}
+        elif lines == self.lines:
+            return
+
+        surfaces = {text: self.line_surfaces.get(text) or self._render_line(renderer, text) for text in lines}
+        self.line_surfaces = surfaces
+        self.lines = list(lines)
+        self._composite(renderer.font.font_size)
+
+    def _render_line(self, renderer, text):
+        # Rendered at an integer pen position, which matches drawing straight to the window
+        atlas = self.atlas
+        left = max((offset_x for _, offset_x, _ in atlas.glyphs.values()), default=0)
+        right = max((area.width - offset_x for area, offset_x, _ in atlas.glyphs.values()), default=0)
+        default_advance = DEFAULT_ADVANCE * renderer.font.font_size
+        width = left + math.ceil(atlas.measure(text, default_advance)) + max(right, 0)
+        surface = pygame.Surface((max(width, 1), max(atlas.bottom - atlas.top, 1)))
+        surface.set_colorkey((0, 0, 0))
+        with renderer._draw_target(surface):
+            renderer.render_text(text, (left, -atlas.top))
+        return surface, left
+
+    def _composite(self, font_size):
+        x, y = self.position
+        placed = []
+        for i, text in enumerate(self.lines):
+            surface, left = self.line_surfaces[text]
+            placed.append((surface, (x - left, int(y + i * font_size * self.line_spacing) + self.atlas.top)))
+        if not placed:
+            self.surface = None
+            return
+
+        x_min = min(pos[0] for _, pos in placed)
+        y_min = min(pos[1] for _, pos in placed)
+        x_max = max(pos[0] + surface.get_width() for surface, pos in placed)
+        y_max = max(pos[1] + surface.get_height() for surface, pos in placed)
+        self.surface = pygame.Surface((x_max - x_min, y_max - y_min))
+        self.surface.set_colorkey((0, 0, 0))
+        self.surface.blits([(surface, (px - x_min, py - y_min)) for surface, (px, py) in placed], doreturn=False)
+        self.offset = (x_min, y_min)
+
+    def draw(self, target):
+        if self.surface is not None:
+            target.blit(self.surface, self.offset)
+
+
+class Viewport:
+    def __init__(self, rect, focal_length=200, perspective_enabled=True):
+        # Area of the window in window pixels; scaled along with the render target
+        self.rect = pygame.Rect(rect)
+        self.display = Display(self.rect.width, self.rect.height)
+        self.display.focal_length = focal_length
+        self.display.perspective_enabled = perspective_enabled
+
+    def surface_in(self, target, scale):
+        area = pygame.Rect(int(self.rect.x * scale), int(self.rect.y * scale),
+                           max(1, int(self.rect.width * scale)), max(1, int(self.rect.height * scale)))
+        area = area.clip(target.get_rect())
+        if area.width == 0 or area.height == 0:
+            return None
+        self.display.width, self.display.height = area.size
+        self.display.camera.set_viewport(area.width, area.height, scale)
+        return target.subsurface(area)
+
+
 class Transformer:
     def __init__(self):
         self.rotation_angles = {'x': 0, 'y': 0, 'z': 0}
+        # State at the previous simulation step, for interpolating between steps
+        self.previous_angles = dict(self.rotation_angles)
+        # Degrees per simulation step
         self.rotation_speed = 0.5
 
     def rotate_x(self, point, angle):
@@ -112,27 +256,186 @@ class Transformer:
         return rotated_point
 
     def update_rotation(self):
+        self.previous_angles = dict(self.rotation_angles)
         self.rotation_angles['x'] += self.rotation_speed
         self.rotation_angles['y'] += self.rotation_speed
         self.rotation_angles['z'] += self.rotation_speed
 
+    def hold_rotation(self):
+        # A simulation step without motion, so interpolation comes to rest
+        self.previous_angles = dict(self.rotation_angles)
+
     def adjust_rotation(self, axis, angle):
+        # Manual nudges jump straight to the new angle instead of being interpolated
         self.rotation_angles[axis] += angle
+        self.previous_angles[axis] += angle
+
+    def interpolated_angles(self, alpha):
+        return tuple(self.previous_angles[axis] + (self.rotation_angles[axis] - self.previous_angles[axis]) * alpha
+                     for axis in ('x', 'y', 'z'))
+
+
+class FixedTimestep:
+    def __init__(self, step=1 / 120, max_steps=5, time_source=time.perf_counter):
+        # Seconds of simulated time per update
+        self.step = step
+        # Updates allowed per rendered frame; time beyond that is dropped so a slow
+        # frame can't snowball into ever more catch-up work
+        self.max_steps = max_steps
+        self.time_source = time_source
+        self.accumulator = 0.0
+        self.last_time = None
+        self.total_steps = 0
+        self.dropped_steps = 0
+
+    def reset(self):
+        self.accumulator = 0.0
+        self.last_time = None
+
+    def advance(self):
+        # Returns how many updates to run this frame and how far (0..1) the
+        # presented state lies between the last two updates
+        now = self.time_source()
+        if self.last_time is not None:
+            self.accumulator += now - self.last_time
+        self.last_time = now
+
+        steps = int(self.accumulator // self.step)
+        if steps > self.max_steps:
+            self.dropped_steps += steps - self.max_steps
+            steps = self.max_steps
+            self.accumulator = self.step * steps + self.accumulator % self.step
+        self.accumulator -= steps * self.step
+        self.total_steps += steps
+        return steps, self.accumulator / self.step
+
+class ResolutionScaler:
+    def __init__(self, target_frame_time, min_scale=0.25, max_scale=1.0, step=0.05, headroom=0.1,
+                 smoothing=0.2, cooldown_frames=10):
+        self.target_frame_time = target_frame_time
+        self.min_scale = min_scale
+        self.max_scale = max_scale
+        self.step = step
+        # Frame times within this fraction of the target leave the scale alone
+        self.headroom = headroom
+        self.smoothing = smoothing
+        self.cooldown_frames = cooldown_frames
+        self.scale = max_scale
+        self.average_frame_time = None
+        self._cooldown = 0
+
+    def update(self, frame_time):
+        if self.average_frame_time is None:
+            self.average_frame_time = frame_time
+        else:
+            self.average_frame_time += self.smoothing * (frame_time - self.average_frame_time)
+
+        if self._cooldown > 0:
+            self._cooldown -= 1
+            return self.scale
+
+        previous = self.scale
+        if self.average_frame_time > self.target_frame_time * (1 + self.headroom):
+            self.scale = max(self.min_scale, self.scale - self.step)
+        elif self.average_frame_time < self.target_frame_time * (1 - self.headroom):
+            # Climb back more slowly than we drop, to avoid oscillating around the target
+            self.scale = min(self.max_scale, self.scale + self.step / 2)
+        if self.scale != previous:
+            self._cooldown = self.cooldown_frames
+        return self.scale
+
+
+class QualityGovernor:
+    def __init__(self, raster_budget, fallback_chain=('wu', 'midpoint', 'bresenham'), motion_algorithm='bresenham',
+                 hysteresis=0.25, degrade_frames=3, restore_frames=30, still_frames=15):
+        # Seconds of line rasterization per frame we are willing to spend
+        self.raster_budget = raster_budget
+        # Algorithms from best looking to cheapest
+        self.fallback_chain = list(fallback_chain)
+        # Ceiling on quality while the view moves; None keeps the chain alone
+        self.motion_algorithm = motion_algorithm
+        # Only restore once raster time is this fraction below the budget
+        self.hysteresis = hysteresis
+        self.degrade_frames = degrade_frames
+        self.restore_frames = restore_frames
+        self.still_frames = still_frames
+        self.level = 0
+        self._over_budget = 0
+        self._under_budget = 0
+        # Start out settled, so a scene that never moves is not capped
+        self._still = still_frames
+
+    def candidates(self, preferred):
+        if preferred in self.fallback_chain:
+            return self.fallback_chain[self.fallback_chain.index(preferred):]
+        return [preferred] + self.fallback_chain[-1:]
+
+    def select(self, preferred, raster_time, moving):
+        candidates = self.candidates(preferred)
+
+        if raster_time > self.raster_budget:
+            self._over_budget += 1
+            self._under_budget = 0
+        elif raster_time < self.raster_budget * (1 - self.hysteresis):
+            self._under_budget += 1
+            self._over_budget = 0
+        else:
+            self._over_budget = self._under_budget = 0
+
+        if self._over_budget >= self.degrade_frames and self.level < len(candidates) - 1:
+            self.level += 1
+            self._over_budget = 0
+        elif self._under_budget >= self.restore_frames and self.level > 0:
+            self.level -= 1
+            self._under_budget = 0
+
+        # The motion cap holds until the view has been still for still_frames; only the
+        # budget decides the level underneath it
+        self._still = 0 if moving else self._still + 1
+        settled = self._still >= self.still_frames
+
+        self.level = min(self.level, len(candidates) - 1)
+        algorithm = candidates[self.level]
+        if not settled and self.motion_algorithm in candidates:
+            algorithm = candidates[max(self.level, candidates.index(self.motion_algorithm))]
+        return algorithm
+
 
 class Renderer:
     def __init__(self, width, height, font_file, font_size=10):
         pygame.init()
         self.width = width
         self.height = height
-        self.screen = pygame.display.set_mode((width, height))
+        self.window = pygame.display.set_mode((width, height))
+        # Everything is drawn to self.screen, which is the window unless rendering downscaled
+        self.screen = self.window
+        self.resolution_scaler = None
+        self.render_target = None
         self.display = Display(width, height)
         self.clock = pygame.time.Clock()
         self.objects = []
+        self.scene = SceneNode(name='root')
         self.transformer = Transformer()
         self.spinning = False
         self.font = STF(font_file, font_size)
+        self.font_atlases = {}
+        # shape -> (triangle corners, indexed vertices, Mesh); weak so removed shapes are freed
+        self.object_meshes = weakref.WeakKeyDictionary()
         print(f"Loaded characters: {self.font.characters.keys()}")
         self.rendering_algorithm = 'bresenham'
+        # What line_renderer actually uses; differs from the user's choice while governed
+        self.active_algorithm = self.rendering_algorithm
+        self.quality_governor = None
+        self.last_raster_time = 0.0
+        self._last_rotation = None
+        # Simulation runs at a fixed rate; rendering presents a blend of the last two steps
+        self.timestep = FixedTimestep()
+        self.render_alpha = 1.0
+        self.hud = HudLayer()
+        self.frame_publisher = None
+        # Empty means a single view through self.display covering the whole window
+        self.viewports = []
+        self.allocation_tracker = None
 
     def bresenham_line_algorithm(self, x1, y1, x2, y2):
         x1, y1, x2, y2 = int(x1), int(y1), int(x2), int(y2)
@@ -293,17 +596,17 @@ class Renderer:
             plot(x1, y1, 1)
 
     def line_renderer(self, x1, y1, x2, y2):
-        if self.rendering_algorithm == 'bresenham':
+        if self.active_algorithm == 'bresenham':
             self.bresenham_line_algorithm(x1, y1, x2, y2)
-        elif self.rendering_algorithm == 'midpoint':
+        elif self.active_algorithm == 'midpoint':
             self.midpoint_line_algorithm(x1, y1, x2, y2)
-        elif self.rendering_algorithm == 'dda':
+        elif self.active_algorithm == 'dda':
             self.bresenham_line_algorithm(x1, y1, x2, y2)
-        elif self.rendering_algorithm == 'quantum':
+        elif self.active_algorithm == 'quantum':
             self.quantum_line_algorithm(x1, y1, x2, y2)
-        elif self.rendering_algorithm == 'simit':
+        elif self.active_algorithm == 'simit':
             self.simit_line_algorithm(x1, y1, x2, y2)
-        elif self.rendering_algorithm == 'wu':
+        elif self.active_algorithm == 'wu':
             self.wu_line_algorithm(x1, y1, x2, y2)
 
 
@@ -311,6 +614,7 @@ class Renderer:
     def set_rendering_algorithm(self, algorithm):
         if algorithm in ['bresenham', 'midpoint', 'dda', 'simit','quantum', 'wu']:
             self.rendering_algorithm = algorithm
+            self.active_algorithm = algorithm
             print(f"Switched to {algorithm} algorithm")
 
     def render_character(self, char, position):
@@ -327,52 +631,309 @@ class Renderer:
                 )
 
     def render_text(self, text, position):
+        atlas = self.get_font_atlas()
+        default_advance = DEFAULT_ADVANCE * self.font.font_size
         x, y = position
+        target_width, target_height = self.screen.get_size()
+        if (x >= target_width or y + atlas.top >= target_height or y + atlas.bottom < 0
+                or x + atlas.measure(text, default_advance) < 0):
+            return
+
+        blits = []
         for char in text:
-            self.render_character(char, (x, y))
-            x += self.font.font_size * 0.8
+            glyph = atlas.glyphs.get(char)
+            if glyph:
+                area, offset_x, offset_y = glyph
+                blits.append((atlas.surface, (int(x) - offset_x, int(y) - offset_y), area))
+            x += atlas.advances.get(char, default_advance)
+        self.screen.blits(blits, doreturn=False)
+
+    def get_font_atlas(self):
+        key = (self.font.font_size, self.rendering_algorithm)
+        if key not in self.font_atlases:
+            self.font_atlases[key] = self.bake_font_atlas()
+        return self.font_atlases[key]
+
+    def bake_font_atlas(self):
+        size = self.font.font_size
+        cells = []
+        for char, data in self.font.characters.items():
+            if data['bounds'] is None:
+                continue
+            x_min, y_min, x_max, y_max = data['bounds']
+            left, top = math.floor(x_min * size), math.floor(y_min * size)
+            width = math.ceil(x_max * size) - left + 2 * ATLAS_PADDING + 1
+            height = math.ceil(y_max * size) - top + 2 * ATLAS_PADDING + 1
+            cells.append((char, left, top, width, height))
+
+        # Simple shelf packing, one row of cells after another
+        placements = []
+        atlas_width = atlas_height = shelf_x = shelf_height = 0
+        for char, left, top, width, height in cells:
+            if shelf_x and shelf_x + width > ATLAS_MAX_WIDTH:
+                atlas_height += shelf_height
+                shelf_x = shelf_height = 0
+            placements.append((char, left, top, pygame.Rect(shelf_x, atlas_height, width, height)))
+            shelf_x += width
+            shelf_height = max(shelf_height, height)
+            atlas_width = max(atlas_width, shelf_x)
+        atlas_height += shelf_height
+
+        surface = pygame.Surface((max(atlas_width, 1), max(atlas_height, 1)))
+        surface.fill((0, 0, 0))
+        surface.set_colorkey((0, 0, 0))
+        glyphs = {}
+        active_algorithm, self.active_algorithm = self.active_algorithm, self.rendering_algorithm
+        with self._draw_target(surface):
+            for char, left, top, area in placements:
+                offset_x, offset_y = ATLAS_PADDING - left, ATLAS_PADDING - top
+                self.render_character(char, (area.x + offset_x, area.y + offset_y))
+                glyphs[char] = (area, offset_x, offset_y)
+        self.active_algorithm = active_algorithm
+
+        advances = {char: data['advance'] * size for char, data in self.font.characters.items()}
+        extent_top = min((top for _, _, top, _, _ in cells), default=0) - ATLAS_PADDING
+        extent_bottom = max((top + height for _, _, top, _, height in cells), default=0)
+        return GlyphAtlas(surface, glyphs, advances, extent_top, extent_bottom)
+
+    @contextmanager
+    def _draw_target(self, surface):
+        previous = self.screen
+        self.screen = surface
+        try:
+            yield surface
+        finally:
+            self.screen = previous
 
     def get_debug_info(self):
         return [
             f"FPS: {self.clock.get_fps():.2f}",
-            f"Rendering: {self.rendering_algorithm}",
+            f"Rendering: {self.rendering_algorithm} (active: {self.active_algorithm})",
             f"Rotation: X:{self.transformer.rotation_angles['x']:.2f} Y:{self.transformer.rotation_angles['y']:.2f} Z:{self.transformer.rotation_angles['z']:.2f}",
             f"Focal Length: {self.display.focal_length}",
             f"Perspective: {'On' if self.display.perspective_enabled else 'Off'}",
             f"Objects: {len(self.objects)}",
             f"Spinning: {'Yes' if self.spinning else 'No'}",
+            f"Simulation: {1 / self.timestep.step:.0f} Hz, {self.timestep.dropped_steps} steps dropped",
             f"Window Size: {self.width}x{self.height}",
+            f"Render Size: {self.display.width}x{self.display.height}",
             "Controls:",
             "Space: Toggle spin | Arrows: Rotate | Q/E: Z-rotation",
-            "W/S: Focal length | P: Toggle perspective",
+            "W/S: Focal length | P: Toggle perspective | R: Dynamic resolution | G: Quality governor",
             "1-6: Change rendering algorithm"
         ]
 
     def render_pixels(self):
+        frame_start = time.perf_counter()
+        self.screen = self._prepare_render_target()
         self.screen.fill((0, 0, 0))
-        for obj in self.objects:
-            transformed_vertices = {}
-            for triangle in obj.triangles:
-                for vertex in (triangle.a, triangle.b, triangle.c):
-                    if vertex not in transformed_vertices:
-                        transformed_vertex = self.transformer.apply_rotation(vertex)
-                        projected_vertex = self.display.project_3d_to_2d(transformed_vertex)
-                        screen_vertex = self.display.to_screen(projected_vertex)
-                        transformed_vertices[vertex] = screen_vertex
-
-                vertices = [transformed_vertices[triangle.a], transformed_vertices[triangle.b],
-                            transformed_vertices[triangle.c]]
-                for i in range(3):
-                    self.line_renderer(*vertices[i], *vertices[(i + 1) % 3])
-
-        debug_info = self.get_debug_info()
-        for i, line in enumerate(debug_info):
-            self.render_text(line, (10, 10 + i * self.font.font_size * 1.5))
+        camera = self.display.camera
+        camera.set_rotation(self.transformer.interpolated_angles(self.render_alpha))
+        self._select_line_algorithm(camera.rotation_angles)
+        self.scene.update()
+        raster_start = time.perf_counter()
+        self._draw_scene(camera)
+        self.last_raster_time = time.perf_counter() - raster_start
+        if self.allocation_tracker:
+            # Snapshots sampled while drawing are the tracker's cost, not the frame's
+            self.last_raster_time -= self.allocation_tracker.sample_time
+
+        if self.screen is not self.window:
+            pygame.transform.scale(self.screen, (self.width, self.height), self.window)
+            self.screen = self.window
+
+        # The HUD always goes on the full resolution window so it stays sharp
+        if self.hud.needs_refresh():
+            self.hud.update(self, self.get_debug_info())
+        self.hud.draw(self.screen)
 
         pygame.display.flip()
+        if self.frame_publisher:
+            pixels = pygame.surfarray.pixels3d(self.window)
+            self.frame_publisher.publish(pixels)
+            del pixels  # Unlocks the window surface
+        frame_time = time.perf_counter() - frame_start
+        if self.allocation_tracker:
+            frame_time -= self.allocation_tracker.sample_time
+        if self.resolution_scaler:
+            self.resolution_scaler.update(frame_time)
+        if self.allocation_tracker:
+            self.allocation_tracker.end_frame(frame_time)
+
+    def _draw_scene(self, camera):
+        views = self._view_surfaces()
+        # With viewports the rotation is applied once here and each viewport only projects;
+        # their cameras never see the rotation otherwise
+        shared = bool(self.viewports)
+        rotation = camera.view_matrix()[:3, :3]
+        for node in self.scene.walk():
+            if node.obj is None:
+                continue
+            mesh = self.get_object_mesh(node.obj)
+            vertices = node.world_vertices(mesh)
+            if shared:
+                vertices = vertices @ rotation.T
+            for display, surface in views:
+                if shared:
+                    screen, visible = display.camera.project_view(vertices)
+                else:
+                    screen, visible = display.camera.project(vertices)
+                edges = mesh.topology.edges
+                # Edges with an end behind the near plane are dropped rather than clipped
+                edges = edges[visible[edges[:, 0]] & visible[edges[:, 1]]]
+                points = screen.tolist()
+                if self.allocation_tracker:
+                    self.allocation_tracker.sample()
+                with self._draw_target(surface):
+                    for a, b in edges.tolist():
+                        self.line_renderer(*points[a], *points[b])
+
+    def add_viewport(self, rect, focal_length=200, perspective_enabled=True):
+        viewport = Viewport(rect, focal_length, perspective_enabled)
+        self.viewports.append(viewport)
+        return viewport
+
+    def split_viewports(self, columns=2, rows=1):
+        # Tiles the window with equally sized viewports, replacing any existing ones
+        self.viewports = []
+        for row in range(rows):
+            for column in range(columns):
+                x, y = self.width * column // columns, self.height * row // rows
+                width = self.width * (column + 1) // columns - x
+                height = self.height * (row + 1) // rows - y
+                self.add_viewport((x, y, width, height))
+        return self.viewports
+
+    def clear_viewports(self):
+        self.viewports = []
+
+    def _view_surfaces(self):
+        if not self.viewports:
+            return [(self.display, self.screen)]
+        scale = self.screen.get_width() / self.width
+        views = []
+        for viewport in self.viewports:
+            surface = viewport.surface_in(self.screen, scale)
+            if surface is not None:
+                views.append((viewport.display, surface))
+        return views
+
+    def enable_frame_publishing(self, name=None, slots=3):
+        # Finished frames go to a shared memory ring that FrameSubscriber can attach to by name
+        self.disable_frame_publishing()
+        self.frame_publisher = FramePublisher(self.width, self.height, slots, name)
+        return self.frame_publisher.name
+
+    def disable_frame_publishing(self):
+        if self.frame_publisher:
+            self.frame_publisher.close()
+            self.frame_publisher = None
+
+    def set_hud_refresh_rate(self, refreshes_per_second):
+        self.hud.refresh_interval = 1 / refreshes_per_second
+        self.hud.expire()
+
+    def set_simulation_rate(self, steps_per_second, max_steps=5, time_source=time.perf_counter):
+        self.timestep = FixedTimestep(1 / steps_per_second, max_steps, time_source)
+
+    def simulate(self):
+        steps, self.render_alpha = self.timestep.advance()
+        for _ in range(steps):
+            if self.spinning:
+                self.transformer.update_rotation()
+            else:
+                self.transformer.hold_rotation()
+        return steps
+
+    def _select_line_algorithm(self, rotation):
+        moving = self.spinning or rotation != self._last_rotation
+        self._last_rotation = rotation
+        if self.quality_governor:
+            self.active_algorithm = self.quality_governor.select(self.rendering_algorithm, self.last_raster_time, moving)
+        else:
+            self.active_algorithm = self.rendering_algorithm
+
+    def enable_quality_governor(self, raster_budget=1 / 120, **governor_options):
+        self.quality_governor = QualityGovernor(raster_budget, **governor_options)
+
+    def toggle_quality_governor(self):
+        self.quality_governor = None if self.quality_governor else QualityGovernor(1 / 120)
 
-    def add_object(self, obj):
+    def enable_allocation_tracking(self, **tracker_options):
+        # Slows every frame down considerably; meant for finding allocations, not for timing
+        self.disable_allocation_tracking()
+        self.allocation_tracker = AllocationTracker(**tracker_options)
+        self.allocation_tracker.start()
+        return self.allocation_tracker
+
+    def disable_allocation_tracking(self):
+        tracker, self.allocation_tracker = self.allocation_tracker, None
+        if tracker:
+            tracker.stop()
+        return tracker
+
+    def enable_dynamic_resolution(self, target_fps=60, **scaler_options):
+        self.resolution_scaler = ResolutionScaler(1 / target_fps, **scaler_options)
+
+    def disable_dynamic_resolution(self):
+        self.resolution_scaler = None
+        self._prepare_render_target()
+
+    def toggle_dynamic_resolution(self, target_fps=60):
+        if self.resolution_scaler:
+            self.disable_dynamic_resolution()
+        else:
+            self.enable_dynamic_resolution(target_fps)
+
+    def _prepare_render_target(self):
+        scale = self.resolution_scaler.scale if self.resolution_scaler else 1.0
+        size = (max(1, int(self.width * scale)), max(1, int(self.height * scale)))
+        self.display.width, self.display.height = size
+        self.display.camera.set_viewport(size[0], size[1], size[0] / self.width)
+        if size == (self.width, self.height):
+            return self.window
+        if self.render_target is None or self.render_target.get_size() != size:
+            self.render_target = pygame.Surface(size)
+        return self.render_target
+
+    def get_object_mesh(self, obj):
+        if isinstance(obj, Mesh):
+            return obj
+        # Shapes are indexed once; move them through their scene node, or call
+        # refresh_object after editing their points
+        cached = self.object_meshes.get(obj)
+        if cached is None:
+            triangles = getattr(obj, 'triangles', [obj])
+            vertices, faces = Mesh.index_triangles(triangles)
+            cached = self.object_meshes[obj] = (self._corners(triangles), vertices,
+                                                Mesh(Mesh.gather_positions(vertices), faces))
+        return cached[2]
+
+    @staticmethod
+    def _corners(triangles):
+        return [vertex for triangle in triangles for vertex in (triangle.a, triangle.b, triangle.c)]
+
+    def refresh_object(self, obj):
+        # Reads an edited shape's points again. The shape is only indexed again, and its
+        # topology rebuilt, if its triangles' corners changed.
+        cached = self.object_meshes.get(obj)
+        if cached is None:
+            return
+        corners, vertices, mesh = cached
+        if self._corners(getattr(obj, 'triangles', [obj])) != corners:
+            del self.object_meshes[obj]
+            return
+        mesh.vertices[...] = Mesh.gather_positions(vertices)
+        mesh.mark_dirty()
+
+    def add_object(self, obj, parent=None, translation=(0, 0, 0), rotation=(0, 0, 0), scale=1):
         self.objects.append(obj)
+        node = SceneNode(obj, translation, rotation, scale)
+        return (parent or self.scene).add_child(node)
+
+    def add_group(self, parent=None, translation=(0, 0, 0), rotation=(0, 0, 0), scale=1, name=None):
+        node = SceneNode(None, translation, rotation, scale, name)
+        return (parent or self.scene).add_child(node)
 
     def run(self):
         running = True
@@ -381,6 +942,7 @@ class Renderer:
                 if event.type == pygame.QUIT:
                     running = False
                 elif event.type == pygame.KEYDOWN:
+                    self.hud.expire()
                     if event.key == pygame.K_SPACE:
                         self.spinning = not self.spinning
                         self.render_pixels()  # Force screen update
@@ -402,6 +964,10 @@ class Renderer:
                         self.display.adjust_focal_length(-5)
                     elif event.key == pygame.K_p:
                         self.display.toggle_perspective()
+                    elif event.key == pygame.K_r:
+                        self.toggle_dynamic_resolution()
+                    elif event.key == pygame.K_g:
+                        self.toggle_quality_governor()
                     elif event.key == pygame.K_1:
                         self.set_rendering_algorithm('bresenham')
                     elif event.key == pygame.K_2:
@@ -415,11 +981,14 @@ class Renderer:
                     elif event.key == pygame.K_6:
                         self.set_rendering_algorithm('wu')
 
-            if self.spinning:
-                self.transformer.update_rotation()
+            self.simulate()
             self.render_pixels()
             self.clock.tick(120)
 
+        self.disable_frame_publishing()
+        tracker = self.disable_allocation_tracking()
+        if tracker:
+            print(tracker.report())
         pygame.quit()
 
 if __name__ == '__main__':
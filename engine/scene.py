@@ -0,0 +1,142 @@
+import numpy as np
+from engine.geometry import Camera
+
+
+class SceneNode:
+    def __init__(self, obj=None, translation=(0, 0, 0), rotation=(0, 0, 0), scale=1, name=None):
+        self.obj = obj
+        self.name = name
+        self.parent = None
+        self.children = []
+        self._translation = tuple(translation)
+        self._rotation = tuple(rotation)
+        self._scale = self._as_scale(scale)
+        self._local = None
+        self.world_matrix = np.identity(4)
+        # Bumped every time world_matrix is recomputed, so caches can tell it changed
+        self.world_version = 0
+        self.dirty = True
+        self.child_dirty = False
+        self._world_vertices = None
+        self._world_vertices_key = None
+
+    @staticmethod
+    def _as_scale(scale):
+        return tuple(scale) if isinstance(scale, (tuple, list)) else (scale, scale, scale)
+
+    @property
+    def translation(self):
+        return self._translation
+
+    @translation.setter
+    def translation(self, value):
+        self._translation = tuple(value)
+        self._local = None
+        self.mark_dirty()
+
+    @property
+    def rotation(self):
+        return self._rotation
+
+    @rotation.setter
+    def rotation(self, value):
+        self._rotation = tuple(value)
+        self._local = None
+        self.mark_dirty()
+
+    @property
+    def scale(self):
+        return self._scale
+
+    @scale.setter
+    def scale(self, value):
+        self._scale = self._as_scale(value)
+        self._local = None
+        self.mark_dirty()
+
+    def translate(self, dx, dy, dz):
+        x, y, z = self._translation
+        self.translation = (x + dx, y + dy, z + dz)
+
+    def rotate(self, dx, dy, dz):
+        x, y, z = self._rotation
+        self.rotation = (x + dx, y + dy, z + dz)
+
+    def add_child(self, node):
+        if node.parent is not None:
+            node.parent.remove_child(node)
+        node.parent = self
+        self.children.append(node)
+        node.mark_dirty(force=True)
+        return node
+
+    def remove_child(self, node):
+        self.children.remove(node)
+        node.parent = None
+        node.mark_dirty(force=True)
+
+    def mark_dirty(self, force=False):
+        # Invariant: everything below a dirty node is dirty too, so an already dirty
+        # node needs no further work
+        if not self.dirty or force:
+            stack = [self]
+            while stack:
+                node = stack.pop()
+                node.dirty = True
+                stack.extend(child for child in node.children if not child.dirty)
+        # Let update() find this subtree without visiting clean siblings
+        parent = self.parent
+        while parent is not None and not parent.child_dirty:
+            parent.child_dirty = True
+            parent = parent.parent
+
+    def local_matrix(self):
+        if self._local is None:
+            local = np.identity(4)
+            local[:3, :3] = Camera.rotation_matrix(*self._rotation) * self._scale
+            local[:3, 3] = self._translation
+            self._local = local
+        return self._local
+
+    def update(self):
+        # Recomputes world matrices for dirty subtrees only; clean branches are skipped
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if node.dirty:
+                parent_world = node.parent.world_matrix if node.parent is not None else None
+                local = node.local_matrix()
+                node.world_matrix = local if parent_world is None else parent_world @ local
+                node.world_version += 1
+                node.dirty = False
+                node.child_dirty = False
+                stack.extend(node.children)
+            elif node.child_dirty:
+                node.child_dirty = False
+                stack.extend(child for child in node.children if child.dirty or child.child_dirty)
+
+    def world_vertices(self, mesh):
+        # Mesh vertices in world space, cached until this node moves, the mesh gets new
+        # vertices, or mesh.mark_dirty() reports an edit made to them in place
+        key = self._world_vertices_key
+        vertices = mesh.vertices
+        if (key is None or key[0] != self.world_version or key[1] is not mesh or key[2] is not vertices
+                or key[3] != mesh.version):
+            matrix = self.world_matrix
+            if np.array_equal(matrix, np.identity(4)):
+                self._world_vertices = vertices
+            else:
+                self._world_vertices = vertices @ matrix[:3, :3].T + matrix[:3, 3]
+            self._world_vertices_key = (self.world_version, mesh, vertices, mesh.version)
+        return self._world_vertices
+
+    def walk(self):
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(node.children))
+
+    def __str__(self):
+        label = self.name or (type(self.obj).__name__ if self.obj is not None else 'group')
+        return f'SceneNode({label}, {len(self.children)} children)'
@@ -0,0 +1,281 @@
+import argparse
+import csv
+import inspect
+import itertools
+import os
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from physics import equations
+
+DEFAULT_CHUNK_SIZE = 65536
+
+
+def resolve_equation(name):
+    # 'Thermodynamics.ideal_gas_law' or a module level function such as 'weight'
+    target = equations
+    for part in name.split('.'):
+        target = getattr(target, part, None)
+        if target is None:
+            raise ValueError(f"Unknown equation: {name}")
+    if not callable(target) or inspect.isclass(target):
+        raise ValueError(f"{name} is not an equation")
+    return target
+
+
+class Equation:
+    def __init__(self, name, inputs=None, output=None):
+        self.name = name
+        # parameter -> column name, or a number used for every row
+        self.inputs = dict(inputs or {})
+        self.output = output or name.rsplit('.', 1)[-1]
+        function = resolve_equation(name)
+        self.parameters = [parameter.name for parameter in inspect.signature(function).parameters.values()
+                           if parameter.kind in (parameter.POSITIONAL_ONLY, parameter.POSITIONAL_OR_KEYWORD)]
+
+    def columns(self):
+        # Columns this equation reads; parameters without a mapping read the column of the same name
+        return [source for source in (self.inputs.get(parameter, parameter) for parameter in self.parameters)
+                if isinstance(source, str)]
+
+    def __call__(self, chunk, rows):
+        arguments = []
+        for parameter in self.parameters:
+            source = self.inputs.get(parameter, parameter)
+            arguments.append(chunk[source] if isinstance(source, str) else source)
+        # Resolved here rather than kept on the instance so equations pickle by name
+        result = resolve_equation(self.name)(*arguments)
+        return np.broadcast_to(np.asarray(result, dtype=np.float64), (rows,))
+
+
+# Sources, each a generator of {column: array} chunks
+
+def read_chunks(path, columns, chunk_size=DEFAULT_CHUNK_SIZE):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        return _read_csv(path, columns, chunk_size)
+    if extension == '.npy':
+        return _read_npy(path, columns, chunk_size)
+    if extension == '.npz':
+        return _read_npz(path, columns, chunk_size)
+    raise ValueError(f"Unsupported input format: {path}")
+
+
+def _read_csv(path, columns, chunk_size):
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        header = [name.strip() for name in next(reader)]
+        missing = [column for column in columns if column not in header]
+        if missing:
+            raise ValueError(f"{path} has no column(s) {', '.join(missing)}")
+        indices = [header.index(column) for column in columns]
+        while True:
+            rows = list(itertools.islice(reader, chunk_size))
+            if not rows:
+                return
+            values = np.array([[row[i] for i in indices] for row in rows], dtype=np.float64).reshape(len(rows), -1)
+            yield {column: values[:, i] for i, column in enumerate(columns)}
+
+
+def _read_npy(path, columns, chunk_size):
+    # Memory mapped, so only the chunk being read is paged in. Structured arrays are
+    # addressed by field name, 2D arrays by column number.
+    data = np.load(path, mmap_mode='r')
+    for start in range(0, len(data), chunk_size):
+        block = data[start:start + chunk_size]
+        if block.dtype.names:
+            yield {column: np.asarray(block[column], dtype=np.float64) for column in columns}
+        else:
+            yield {column: np.asarray(block[:, int(column)], dtype=np.float64) for column in columns}
+
+
+def _read_npz(path, columns, chunk_size):
+    # Members of an .npz are streamed out of the zip one chunk at a time instead of
+    # being loaded whole, which np.load would do
+    with zipfile.ZipFile(path) as archive:
+        readers = [_npz_member_chunks(archive, column, chunk_size) for column in columns]
+        for values in zip(*readers):
+            yield dict(zip(columns, values))
+
+
+def _npz_member_chunks(archive, name, chunk_size):
+    member = name if name.endswith('.npy') else name + '.npy'
+    if member not in archive.namelist():
+        raise ValueError(f"{archive.filename} has no array {name}")
+    with archive.open(member) as f:
+        if np.lib.format.read_magic(f) == (1, 0):
+            shape, _, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, _, dtype = np.lib.format.read_array_header_2_0(f)
+        if len(shape) != 1:
+            raise ValueError(f"{name} in {archive.filename} must be one dimensional")
+        if dtype.hasobject:
+            raise ValueError(f"{name} in {archive.filename} holds Python objects")
+        remaining = shape[0]
+        while remaining:
+            count = min(chunk_size, remaining)
+            buffer = f.read(count * dtype.itemsize)
+            yield np.frombuffer(buffer, dtype=dtype).astype(np.float64)
+            remaining -= count
+
+
+# Sinks, written to as chunks arrive
+
+class CsvWriter:
+    def __init__(self, path, columns):
+        self.file = open(path, 'w', newline='', encoding='utf-8')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(columns)
+        self.columns = columns
+
+    def write(self, results):
+        self.writer.writerows(zip(*(results[column].tolist() for column in self.columns)))
+
+    def close(self):
+        self.file.close()
+
+
+class NpyWriter:
+    # One equation gives a plain float64 array, several a structured array with one field each.
+    # The header is rewritten with the final length once all rows are in.
+    def __init__(self, path, columns):
+        self.file = open(path, 'wb')
+        self.columns = columns
+        if len(columns) == 1:
+            self.dtype = np.dtype(np.float64)
+        else:
+            self.dtype = np.dtype([(column, np.float64) for column in columns])
+        # Room for the header of the longest array we could ever write
+        self.header_size = 0
+        self.header_size = -(-len(self._header(10 ** 18)) // 64) * 64
+        self.rows = 0
+        self.file.write(self._header(self.rows))
+
+    def _header(self, rows):
+        header = {'descr': np.lib.format.dtype_to_descr(self.dtype), 'fortran_order': False, 'shape': (rows,)}
+        text = repr(header).encode('latin1')
+        preamble = np.lib.format.magic(2, 0)
+        padding = max(self.header_size - len(preamble) - 4 - len(text) - 1, 0)
+        text += b' ' * padding + b'\n'
+        return preamble + len(text).to_bytes(4, 'little') + text
+
+    def write(self, results):
+        rows = len(results[self.columns[0]])
+        if self.dtype.names:
+            block = np.empty(rows, dtype=self.dtype)
+            for column in self.columns:
+                block[column] = results[column]
+        else:
+            block = np.ascontiguousarray(results[self.columns[0]], dtype=np.float64)
+        self.file.write(block.tobytes())
+        self.rows += rows
+
+    def close(self):
+        self.file.seek(0)
+        self.file.write(self._header(self.rows))
+        self.file.close()
+
+
+def open_writer(path, columns):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        return CsvWriter(path, columns)
+    if extension == '.npy':
+        return NpyWriter(path, columns)
+    raise ValueError(f"Unsupported output format: {path}")
+
+
+def evaluate_chunk(equation_list, chunk):
+    rows = len(next(iter(chunk.values()))) if chunk else 0
+    return {equation.output: equation(chunk, rows) for equation in equation_list}
+
+
+def evaluate_stream(chunks, equation_list, workers=None):
+    # Yields result chunks in input order. With workers, at most two chunks per worker
+    # are in flight so memory stays bounded however long the input is.
+    if not workers or workers <= 1:
+        for chunk in chunks:
+            yield evaluate_chunk(equation_list, chunk)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(evaluate_chunk, equation_list, chunk))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def run_batch(input_path, output_path, equation_list, chunk_size=DEFAULT_CHUNK_SIZE, workers=None):
+    outputs = [equation.output for equation in equation_list]
+    if len(set(outputs)) != len(outputs):
+        raise ValueError("Equations need distinct output names")
+    for equation in equation_list:
+        # With nothing to read there are no rows to evaluate over
+        if not equation.columns():
+            raise ValueError(f"{equation.name} reads no column, every input is a constant")
+    columns = list(dict.fromkeys(column for equation in equation_list for column in equation.columns()))
+
+    rows = 0
+    writer = open_writer(output_path, outputs)
+    try:
+        for results in evaluate_stream(read_chunks(input_path, columns, chunk_size), equation_list, workers):
+            writer.write(results)
+            rows += len(results[outputs[0]])
+    finally:
+        writer.close()
+    return rows
+
+
+def _parse_mapping(text):
+    parameter, _, source = text.partition('=')
+    if not source:
+        raise argparse.ArgumentTypeError(f"Expected parameter=column, got {text}")
+    return parameter, source
+
+
+def _parse_constant(text):
+    parameter, _, value = text.partition('=')
+    try:
+        return parameter, float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected parameter=number, got {text}") from None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate physics equations over the rows of a data file.")
+    parser.add_argument('input', help="CSV with a header row, .npy (structured or 2D) or .npz of 1D arrays")
+    parser.add_argument('output', help="Where to write results, .csv or .npy")
+    parser.add_argument('-e', '--equation', action='append', required=True,
+                        help="Equation to evaluate, e.g. Thermodynamics.ideal_gas_law (repeatable); "
+                             "append =NAME to choose the output column")
+    parser.add_argument('-m', '--map', action='append', type=_parse_mapping, default=[],
+                        help="parameter=column, applied to every equation (repeatable); columns of a 2D "
+                             ".npy are numbered from 0")
+    parser.add_argument('-k', '--constant', action='append', type=_parse_constant, default=[],
+                        help="parameter=number used for every row, applied to every equation (repeatable)")
+    parser.add_argument('-c', '--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help=f"Rows evaluated at a time (default {DEFAULT_CHUNK_SIZE})")
+    parser.add_argument('-j', '--workers', type=int, default=None, help="Worker processes (default: none)")
+    args = parser.parse_args(argv)
+
+    inputs = dict(args.map)
+    inputs.update(args.constant)
+    equation_list = []
+    for text in args.equation:
+        name, _, output = text.partition('=')
+        equation_list.append(Equation(name, inputs, output or None))
+
+    try:
+        rows = run_batch(args.input, args.output, equation_list, args.chunk_size, args.workers)
+    except ValueError as error:
+        parser.error(str(error))
+    print(f"Evaluated {len(equation_list)} equation(s) over {rows} rows into {args.output}")
+
+
+if __name__ == "__main__":
+    main()
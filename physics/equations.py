@@ -1,6 +1,10 @@
 import numpy as np
 from physics.constants import *
 
+# Added to e^x - 1 in the Planck spectra. At x = 0 their numerators are 0 as well, so this
+# turns 0 / 0 into the limit 0; for any x above about 1e-290 it changes nothing.
+EXPM1_FLOOR = np.finfo(np.float64).tiny
+
 
 def weight(mass):
     result = mass * g
@@ -17,12 +21,11 @@ def area(L, B):
     return L * B
 
 def is_right(a, b, c):
-    if a > b and a > c:
-        return a == math.sqrt(b ** 2 + c ** 2)
-    elif b > a and b > c:
-        return b == math.sqrt(a ** 2 + c ** 2)
-    else:
-        return c == math.sqrt(a ** 2 + b ** 2)
+    a, b, c = np.asarray(a), np.asarray(b), np.asarray(c)
+    result = np.where((a > b) & (a > c), a == np.sqrt(b ** 2 + c ** 2),
+                      np.where((b > a) & (b > c), b == np.sqrt(a ** 2 + c ** 2),
+                               c == np.sqrt(a ** 2 + b ** 2)))
+    return result[()]
 
 class Gravitation:
     def __init__(self):
@@ -62,15 +65,15 @@ class Gravitation:
 
     @staticmethod
     def escape_velocity(mass, radius):
-        return math.sqrt(2 * G * mass / radius)
+        return np.sqrt(2 * G * mass / radius)
 
     @staticmethod
     def orbital_velocity(mass, radius):
-        return math.sqrt(G * mass / radius)
+        return np.sqrt(G * mass / radius)
 
     @staticmethod
     def period_of_orbit(mass, radius):
-        return 2 * math.pi * math.sqrt(radius ** 3 / (G * mass))
+        return 2 * math.pi * np.sqrt(radius ** 3 / (G * mass))
 
     @staticmethod
     def gravitational_potential(mass, distance):
@@ -132,7 +135,7 @@ class Mechanics:
 
     @staticmethod
     def work(force, displacement, angle=0):
-        return force * displacement * math.cos(math.radians(angle))
+        return force * displacement * np.cos(np.radians(angle))
 
     @staticmethod
     def kinetic_energy(mass, velocity):
@@ -195,8 +198,8 @@ class Errors:
     @staticmethod
     def absolute_error(a, n):
         if len(a) == n:
-            A = np.array(a)
-            S = np.sum(A)
+            A = np.asarray(a)
+            S = np.sum(A, axis=0)
             E = S / n
             return E
         else:
@@ -205,11 +208,8 @@ class Errors:
     @staticmethod
     def meanabsolute_error(a, n):
         if len(a) == n:
-            b = []
-            for i in a:
-                b.append(abs(i))
-            A = np.array(b)
-            S = np.sum(A)
+            A = np.abs(np.asarray(a))
+            S = np.sum(A, axis=0)
             M = S / n
             return M
         else:
@@ -340,11 +340,11 @@ class Subatomic:
 
     @staticmethod
     def radioactive_decay(initial_amount, decay_constant, time):
-        return initial_amount * math.exp(-decay_constant * time)
+        return initial_amount * np.exp(-decay_constant * time)
 
     @staticmethod
     def half_life(decay_constant):
-        return math.log(2) / decay_constant
+        return np.log(2) / decay_constant
 
     class Mass:
         electron = 9.1 * (math.pow(10, -31))
@@ -389,7 +389,7 @@ class Waves:
 
     @staticmethod
     def sound_level(intensity):
-        return 10 * math.log10(intensity / (10 ** -12))
+        return 10 * np.log10(intensity / (10 ** -12))
 
     @staticmethod
     def beats_frequency(frequency1, frequency2):
@@ -503,7 +503,7 @@ class Electromagnetism:
 
     @staticmethod
     def compton_wavelength_change(initial_wavelength, scattering_angle):
-        return initial_wavelength - (compton_wavelength * (1 - math.cos(scattering_angle)))
+        return initial_wavelength - (compton_wavelength * (1 - np.cos(scattering_angle)))
 
     @staticmethod
     def bohr_orbit_radius(principal_quantum_number):
@@ -544,11 +544,11 @@ class Electromagnetism:
 
     @staticmethod
     def snells_law(n1, n2, angle_of_incidence):
-        return (n1 * math.sin(angle_of_incidence)) / n2
+        return (n1 * np.sin(angle_of_incidence)) / n2
 
     @staticmethod
     def critical_angle(n1, n2):
-        return math.asin(n2 / n1)
+        return np.arcsin(n2 / n1)
 
     @staticmethod
     def photoelectric_effect_work_function(hv, threshold_frequency):
@@ -556,15 +556,15 @@ class Electromagnetism:
 
     @staticmethod
     def photoelectric_effect_max_velocity(work_function, stopping_potential):
-        return math.sqrt((2 * elementary_charge * (stopping_potential - work_function)) / Subatomic.Mass.electron)
+        return np.sqrt((2 * elementary_charge * (stopping_potential - work_function)) / Subatomic.Mass.electron)
 
     @staticmethod
     def decay_law(initial_quantity, decay_constant, time):
-        return initial_quantity * math.exp(-decay_constant * time)
+        return initial_quantity * np.exp(-decay_constant * time)
 
     @staticmethod
     def half_life(decay_constant):
-        return math.log(2) / decay_constant
+        return np.log(2) / decay_constant
 
     @staticmethod
     def nuclear_binding_energy(mass_defect):
@@ -573,7 +573,7 @@ class Electromagnetism:
 
     @staticmethod
     def radioactive_decay(initial_quantity, final_quantity, time):
-        return -initial_quantity * math.log(final_quantity / initial_quantity) / time
+        return -initial_quantity * np.log(final_quantity / initial_quantity) / time
 
     @staticmethod
     def einstein_mass_energy_equivalence(mass):
@@ -646,7 +646,7 @@ class Thermodynamics:
 
     @staticmethod
     def root_mean_square_speed(molar_mass, temperature):
-        return math.sqrt((3 * boltzmann_constant * temperature) / molar_mass)
+        return np.sqrt((3 * boltzmann_constant * temperature) / molar_mass)
 
     @staticmethod
     def average_kinetic_energy(molar_mass, temperature):
@@ -654,7 +654,7 @@ class Thermodynamics:
 
     @staticmethod
     def speed_of_sound(molar_mass, temperature, gamma):
-        return math.sqrt(gamma * boltzmann_constant * temperature / molar_mass)
+        return np.sqrt(gamma * boltzmann_constant * temperature / molar_mass)
 
     @staticmethod
     def specific_heat_capacity(mass, temperature_change, heat_transfer):
@@ -681,13 +681,15 @@ class QuantumMechanics:
 
     @staticmethod
     def tunneling_probability(energy_barrier, particle_mass, particle_energy):
-        return math.exp((-2 * math.sqrt(2 * particle_mass * energy_barrier) / plancks_constant) *
-                        math.sqrt(particle_energy - energy_barrier))
+        return np.exp((-2 * np.sqrt(2 * particle_mass * energy_barrier) / plancks_constant) *
+                        np.sqrt(particle_energy - energy_barrier))
 
     @staticmethod
+    @np.errstate(over='ignore')
     def black_body_radiation_intensity(frequency, temperature):
-        return (2 * plancks_constant * frequency ** 3) / (
-                speed_of_light ** 2 * (math.exp((plancks_constant * frequency) / (boltzmann_constant * temperature)) - 1))
+        # Where e^x overflows the intensity is the correct 0, as it is at zero frequency
+        return (2 * plancks_constant * frequency ** 3) / (speed_of_light ** 2 * (
+                np.expm1((plancks_constant * frequency) / (boltzmann_constant * temperature)) + EXPM1_FLOOR))
 
     @staticmethod
     def black_body_radiation_power(temperature):
@@ -695,12 +697,16 @@ class QuantumMechanics:
                                                                                  speed_of_light ** 2)
 
     @staticmethod
+    @np.errstate(over='ignore')
     def fermi_dirac_distribution(energy, fermi_level, temperature):
-        return 1 / (math.exp((energy - fermi_level) / (boltzmann_constant * temperature)) + 1)
+        # Where e^x overflows the occupation is the correct 0
+        return 1 / (np.exp((energy - fermi_level) / (boltzmann_constant * temperature)) + 1)
 
     @staticmethod
+    @np.errstate(over='ignore', divide='ignore')
     def bose_einstein_distribution(energy, chemical_potential, temperature):
-        return 1 / (math.exp((energy - chemical_potential) / (boltzmann_constant * temperature)) - 1)
+        # expm1 keeps precision near the pole at 0, where the result is infinite
+        return 1 / np.expm1((energy - chemical_potential) / (boltzmann_constant * temperature))
 
     @staticmethod
     def wave_particle_duality(wavelength, momentum):
@@ -733,19 +739,23 @@ class QuantumMechanics:
         return plancks_constant / momentum
 
     @staticmethod
+    @np.errstate(over='ignore')
     def plank_distribution_radiation(energy, temperature):
-        return (2 * plancks_constant * (energy ** 3)) / (
-                speed_of_light ** 2 * (math.exp((plancks_constant * energy) / (boltzmann_constant * temperature)) - 1))
+        return (2 * plancks_constant * (energy ** 3)) / (speed_of_light ** 2 * (
+                np.expm1((plancks_constant * energy) / (boltzmann_constant * temperature)) + EXPM1_FLOOR))
 
     @staticmethod
+    @np.errstate(over='ignore')
     def plank_distribution(energy, temperature):
-        return (2 * energy ** 2) / (
-                (plancks_constant ** 3) * (speed_of_light ** 2) * (math.exp(energy / (boltzmann_constant * temperature)) - 1))
+        # The constants are divided out first; times EXPM1_FLOOR they would underflow to 0
+        return (2 * energy ** 2) / ((plancks_constant ** 3) * (speed_of_light ** 2)) / (
+                np.expm1(energy / (boltzmann_constant * temperature)) + EXPM1_FLOOR)
 
     @staticmethod
+    @np.errstate(over='ignore')
     def plank_law_intensity(frequency, temperature):
-        return (2 * plancks_constant * frequency ** 3) / (
-                speed_of_light ** 2 * (math.exp((plancks_constant * frequency) / (boltzmann_constant * temperature)) - 1))
+        return (2 * plancks_constant * frequency ** 3) / (speed_of_light ** 2 * (
+                np.expm1((plancks_constant * frequency) / (boltzmann_constant * temperature)) + EXPM1_FLOOR))
 
     @staticmethod
     def plank_law_power(temperature):
@@ -789,11 +799,11 @@ class QuantumMechanics:
 
     @staticmethod
     def nuclear_decay_constant(half_life):
-        return math.log(2) / half_life
+        return np.log(2) / half_life
 
     @staticmethod
     def nuclear_decay(initial_quantity, decay_constant, time):
-        return initial_quantity * math.exp(-decay_constant * time)
+        return initial_quantity * np.exp(-decay_constant * time)
 
 class SolidStatePhysics:
     @staticmethod
@@ -814,7 +824,7 @@ class SolidStatePhysics:
 
     @staticmethod
     def band_gap(fermi_energy, temperature):
-        return 2 * boltzmann_constant * temperature * math.log(2) - fermi_energy
+        return 2 * boltzmann_constant * temperature * np.log(2) - fermi_energy
 
     @staticmethod
     def energy_band(kinetic_energy, potential_energy):
@@ -826,12 +836,12 @@ class SolidStatePhysics:
 
     @staticmethod
     def intrinsic_carrier_concentration(donor_density, acceptor_density, fermi_energy, intrinsic_fermi_level, temperature):
-        return ((donor_density * acceptor_density) ** 0.5) * math.exp(
+        return ((donor_density * acceptor_density) ** 0.5) * np.exp(
             -(fermi_energy - intrinsic_fermi_level) / (2 * boltzmann_constant * temperature))
 
     @staticmethod
     def depletion_layer_width(fermi_energy, potential_difference, electron_density):
-        return math.sqrt((2 * permittivity_of_free_space * potential_difference) / (
+        return np.sqrt((2 * permittivity_of_free_space * potential_difference) / (
                 Subatomic.Charge.electron * electron_density)) / (2 * fermi_energy)
 
     @staticmethod
@@ -870,7 +880,7 @@ class FluidStatePhysics:
 
     @staticmethod
     def surface_tension(surface_tension_coefficient, contact_angle, radius_of_curvature):
-        return surface_tension_coefficient * math.cos(contact_angle) / radius_of_curvature
+        return surface_tension_coefficient * np.cos(contact_angle) / radius_of_curvature
 
     @staticmethod
     def capillary_pressure(surface_tension, radius_of_curvature):
@@ -925,7 +935,7 @@ def angle(ab, bc, ca):
     ab_sq = ab ** 2
     bc_sq = bc ** 2
     ca_sq = ca ** 2
-    return math.acos((ab_sq + bc_sq - ca_sq) / (2 * ab * bc))
+    return np.arccos((ab_sq + bc_sq - ca_sq) / (2 * ab * bc))
 
 
 
@@ -936,7 +946,7 @@ def circumference(*args):
         return 2 * math.pi * radius
     elif len(args) == 2:
         a, b = args
-        return math.pi * (3 * (a + b) - math.sqrt((3 * a + b) * (a + 3 * b)))
+        return math.pi * (3 * (a + b) - np.sqrt((3 * a + b) * (a + 3 * b)))
     else:
         raise ValueError("Invalid number of arguments for circumference")
 
@@ -0,0 +1,248 @@
+import numpy as np
+
+# Integrators for many particles moving under x'' = a(t, x, x'). Particle states are
+# arrays of any shape, e.g. (N, 3) positions and velocities, stepped in place. The
+# acceleration callback fills a preallocated array rather than returning a new one:
+#
+#     def acceleration(t, positions, velocities, out):
+#         np.multiply(positions, -k, out=out)
+#
+# Every buffer is allocated on the first step (and again only if the state's shape or
+# dtype changes), so stepping allocates nothing that scales with the particle count.
+# For constant acceleration all but Euler reproduce Mechanics.uniform_accelerated_motion
+# exactly.
+
+
+class Integrator:
+    buffer_count = 0
+
+    def __init__(self, acceleration):
+        self.acceleration = acceleration
+        # Calls made to the acceleration callback, the cost that matters in comparing methods
+        self.evaluations = 0
+        self._buffers = None
+
+    def _allocate(self, positions):
+        buffers = self._buffers
+        if buffers is None or buffers[0].shape != positions.shape or buffers[0].dtype != positions.dtype:
+            self._buffers = [np.empty_like(positions) for _ in range(self.buffer_count)]
+            self.reset()
+        return self._buffers
+
+    def _evaluate(self, t, positions, velocities, out):
+        self.evaluations += 1
+        self.acceleration(t, positions, velocities, out)
+
+    def reset(self):
+        # Forget state carried between steps; call after changing positions or velocities by hand
+        pass
+
+    def step(self, t, positions, velocities, dt):
+        # Advances positions and velocities in place, returning the new time
+        raise NotImplementedError
+
+    def integrate(self, t, positions, velocities, t_end, dt):
+        # Steps of dt up to t_end, the last one shortened to land on it
+        while t < t_end:
+            t = self.step(t, positions, velocities, min(dt, t_end - t))
+        return t
+
+
+class Euler(Integrator):
+    # Explicit Euler, first order. Cheap, but energy grows steadily in oscillating systems.
+    buffer_count = 2
+
+    def step(self, t, positions, velocities, dt):
+        acceleration, scratch = self._allocate(positions)
+        self._evaluate(t, positions, velocities, acceleration)
+        np.multiply(velocities, dt, out=scratch)
+        positions += scratch
+        np.multiply(acceleration, dt, out=scratch)
+        velocities += scratch
+        return t + dt
+
+
+class VelocityVerlet(Integrator):
+    # Second order and symplectic for accelerations that depend on position only, so energy
+    # errors stay bounded over long runs. One evaluation per step: the acceleration at the
+    # end of a step is kept for the start of the next. Velocity dependent forces see the
+    # velocity from the start of the step.
+    buffer_count = 3
+
+    def reset(self):
+        self._time = None
+
+    def step(self, t, positions, velocities, dt):
+        acceleration, next_acceleration, scratch = self._allocate(positions)
+        if self._time != t:
+            self._evaluate(t, positions, velocities, acceleration)
+
+        np.multiply(velocities, dt, out=scratch)
+        positions += scratch
+        np.multiply(acceleration, 0.5 * dt * dt, out=scratch)
+        positions += scratch
+        self._evaluate(t + dt, positions, velocities, next_acceleration)
+        np.add(acceleration, next_acceleration, out=scratch)
+        scratch *= 0.5 * dt
+        velocities += scratch
+
+        # Swap rather than copy, the new acceleration becomes the one to start from
+        self._buffers[0], self._buffers[1] = next_acceleration, acceleration
+        self._time = t + dt
+        return self._time
+
+
+class RK4(Integrator):
+    # Classic fourth order Runge-Kutta on the pair (positions, velocities), four evaluations per step
+    buffer_count = 6
+
+    def step(self, t, positions, velocities, dt):
+        stage_positions, stage_velocities, acceleration, position_sum, velocity_sum, scratch = \
+            self._allocate(positions)
+        half = 0.5 * dt
+
+        # k1 = (v, a(t, x, v))
+        self._evaluate(t, positions, velocities, acceleration)
+        np.copyto(position_sum, velocities)
+        np.copyto(velocity_sum, acceleration)
+        # k2 and k3 at the midpoint, each from the previous stage's derivatives; both count twice
+        for previous_velocities in (velocities, stage_velocities):
+            np.multiply(previous_velocities, half, out=stage_positions)
+            stage_positions += positions
+            np.multiply(acceleration, half, out=stage_velocities)
+            stage_velocities += velocities
+            self._evaluate(t + half, stage_positions, stage_velocities, acceleration)
+            np.multiply(stage_velocities, 2, out=scratch)
+            position_sum += scratch
+            np.multiply(acceleration, 2, out=scratch)
+            velocity_sum += scratch
+        # k4 at the end of the step
+        np.multiply(stage_velocities, dt, out=stage_positions)
+        stage_positions += positions
+        np.multiply(acceleration, dt, out=stage_velocities)
+        stage_velocities += velocities
+        self._evaluate(t + dt, stage_positions, stage_velocities, acceleration)
+        position_sum += stage_velocities
+        velocity_sum += acceleration
+
+        position_sum *= dt / 6
+        positions += position_sum
+        velocity_sum *= dt / 6
+        velocities += velocity_sum
+        return t + dt
+
+
+# Dormand-Prince 5(4) tableau
+DP_C = (0.0, 1 / 5, 3 / 10, 4 / 5, 8 / 9, 1.0, 1.0)
+DP_A = (
+    (),
+    (1 / 5,),
+    (3 / 40, 9 / 40),
+    (44 / 45, -56 / 15, 32 / 9),
+    (19372 / 6561, -25360 / 2187, 64448 / 6561, -212 / 729),
+    (9017 / 3168, -355 / 33, 46732 / 5247, 49 / 176, -5103 / 18656),
+    (35 / 384, 0.0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84),
+)
+# Fifth order weights (the last row of DP_A) minus the embedded fourth order ones
+DP_ERROR = (71 / 57600, 0.0, -71 / 16695, 71 / 1920, -17253 / 339200, 22 / 525, -1 / 40)
+
+
+class RK45(Integrator):
+    # Adaptive Dormand-Prince: a fifth order step with an embedded fourth order estimate of
+    # its error, used to choose the step size. All particles share one step, sized for the
+    # worst of them. The last stage is the first stage of the next step, so an accepted step
+    # costs six evaluations. Holds 17 state sized buffers.
+    buffer_count = 17
+
+    def __init__(self, acceleration, rtol=1e-6, atol=1e-9, safety=0.9, min_factor=0.2, max_factor=5.0,
+                 min_step=0.0):
+        super().__init__(acceleration)
+        self.rtol = rtol
+        self.atol = atol
+        self.safety = safety
+        self.min_factor = min_factor
+        self.max_factor = max_factor
+        self.min_step = min_step
+        # Step size to try next, after the last accepted or rejected attempt
+        self.dt = None
+        self.accepted = 0
+        self.rejected = 0
+
+    def reset(self):
+        self._time = None
+
+    def step(self, t, positions, velocities, dt):
+        # Takes one step, retrying with smaller ones until the error is within tolerance.
+        # Returns the new time, which may be short of t + dt; self.dt holds the next step to try.
+        buffers = self._allocate(positions)
+        stage_velocities = [velocities] + buffers[0:6]
+        accelerations = buffers[6:13]
+        stage_positions, scratch, scale, other = buffers[13:17]
+        if self._time != t:
+            self._evaluate(t, positions, velocities, accelerations[0])
+
+        while True:
+            for stage in range(1, 7):
+                self._combine(stage_positions, positions, stage_velocities, DP_A[stage], dt, scratch)
+                self._combine(stage_velocities[stage], velocities, accelerations, DP_A[stage], dt, scratch)
+                self._evaluate(t + DP_C[stage] * dt, stage_positions, stage_velocities[stage], accelerations[stage])
+            # The last stage is the fifth order solution itself
+            error = (self._error(stage_velocities, positions, stage_positions, dt, scratch, scale, other)
+                     + self._error(accelerations, velocities, stage_velocities[6], dt, scratch, scale, other))
+            error = np.sqrt(error / (2 * positions.size))
+
+            if error <= 1:
+                factor = self.max_factor if error == 0 else min(self.max_factor, self.safety * error ** -0.2)
+                self.dt = dt * factor
+                self.accepted += 1
+                break
+            self.rejected += 1
+            if not np.isfinite(error):
+                factor = self.min_factor
+            else:
+                factor = max(self.min_factor, self.safety * error ** -0.2)
+            dt *= factor
+            self.dt = dt
+            if dt <= self.min_step:
+                raise ValueError(f"Step size {dt:g} fell below min_step at t = {t:g}")
+
+        np.copyto(positions, stage_positions)
+        np.copyto(velocities, stage_velocities[6])
+        # First same as last: the acceleration at the new state starts the next step
+        buffers[6], buffers[12] = buffers[12], buffers[6]
+        self._time = t + dt
+        return self._time
+
+    @staticmethod
+    def _combine(out, start, derivatives, weights, dt, scratch):
+        # out = start + dt * sum(weight * derivative)
+        np.copyto(out, start)
+        for weight, derivative in zip(weights, derivatives):
+            if weight:
+                np.multiply(derivative, weight * dt, out=scratch)
+                out += scratch
+
+    def _error(self, derivatives, old, new, dt, scratch, scale, other):
+        # Sum of squares of the error estimate, each component scaled by atol + rtol * |value|
+        np.multiply(derivatives[0], DP_ERROR[0] * dt, out=scratch)
+        for weight, derivative in zip(DP_ERROR[1:], derivatives[1:]):
+            if weight:
+                np.multiply(derivative, weight * dt, out=other)
+                scratch += other
+        np.abs(old, out=scale)
+        np.abs(new, out=other)
+        np.maximum(scale, other, out=scale)
+        scale *= self.rtol
+        scale += self.atol
+        scratch /= scale
+        return float(np.vdot(scratch, scratch))
+
+    def integrate(self, t, positions, velocities, t_end, dt=None):
+        # dt is only the first step to try; after that the error estimate picks the step
+        dt = self.dt or dt
+        if dt is None:
+            raise ValueError("RK45 needs an initial step size")
+        while t < t_end:
+            t = self.step(t, positions, velocities, min(dt, t_end - t))
+            dt = self.dt
+        return t
@@ -0,0 +1,280 @@
+import argparse
+import time
+
+import numpy as np
+from physics.constants import G
+from physics.equations import Gravitation
+
+DEFAULT_THETA = 0.5
+# Below this many bodies the direct O(N^2) sum is faster than building a tree
+DIRECT_THRESHOLD = 512
+# Targets per block in the direct sum, bounding its temporaries to DIRECT_CHUNK * N
+DIRECT_CHUNK = 256
+# Cells with at most LEAF_SIZE bodies are not split further
+LEAF_SIZE = 8
+# Neighbouring bodies walking the tree together, sharing one interaction list
+GROUP_SIZE = 16
+# Bodies walking the tree at a time, and body-source interactions evaluated at a time
+TREE_CHUNK = 8192
+INTERACTION_BLOCK = 65536
+# Morton codes hold 21 bits per axis
+MAX_DEPTH = 21
+
+
+def direct_accelerations(positions, masses, softening=0.0, chunk_size=DIRECT_CHUNK):
+    # Exact pairwise sum, vectorized over blocks of targets
+    positions = np.asarray(positions, dtype=np.float64)
+    masses = np.asarray(masses, dtype=np.float64)
+    count = len(positions)
+    acceleration = np.zeros((count, 3))
+    for start in range(0, count, chunk_size):
+        stop = min(start + chunk_size, count)
+        difference = positions[None, :, :] - positions[start:stop, None, :]
+        distance = np.sqrt(np.einsum('ijk,ijk->ij', difference, difference) + softening * softening)
+        # A body exerts no force on itself
+        distance[np.arange(stop - start), np.arange(start, stop)] = np.inf
+        magnitude = Gravitation.gravitational_field_strength(masses[None, :], distance) / distance
+        acceleration[start:stop] = np.einsum('ij,ijk->ik', magnitude, difference)
+    return acceleration
+
+
+def _spread_bits(values):
+    # Inserts two zero bits after each of the low 21 bits, for interleaving into Morton codes
+    values = values.astype(np.uint64) & np.uint64(0x1fffff)
+    for shift, mask in ((32, 0x1f00000000ffff), (16, 0x1f0000ff0000ff), (8, 0x100f00f00f00f00f),
+                        (4, 0x10c30c30c30c30c3), (2, 0x1249249249249249)):
+        values = (values | (values << np.uint64(shift))) & np.uint64(mask)
+    return values
+
+
+class Octree:
+    # Bodies are sorted along a Morton curve, which makes every cell of the tree a contiguous
+    # range of the sorted bodies, and a cell's children a contiguous range of the next level.
+    # Each level is then a handful of array operations: per level, start / end index the
+    # sorted bodies, and mass, center (of mass) and count describe each cell.
+
+    def __init__(self, positions, masses, leaf_size=LEAF_SIZE, max_depth=MAX_DEPTH):
+        positions = np.asarray(positions, dtype=np.float64)
+        masses = np.asarray(masses, dtype=np.float64)
+        low = positions.min(axis=0)
+        self.size = max(float((positions.max(axis=0) - low).max()), np.finfo(np.float64).tiny) * (1 + 1e-9)
+        resolution = 1 << max_depth
+        cells = np.minimum(((positions - low) / self.size * resolution).astype(np.int64), resolution - 1)
+        codes = (_spread_bits(cells[:, 0]) << np.uint64(2)) | (_spread_bits(cells[:, 1]) << np.uint64(1)) \
+            | _spread_bits(cells[:, 2])
+        self.order = np.argsort(codes, kind='stable')
+        codes = codes[self.order]
+        self.positions = positions[self.order]
+        self.masses = masses[self.order]
+        weighted = self.positions * self.masses[:, None]
+
+        self.start, self.end, self.mass, self.center, self.count = [], [], [], [], []
+        for level in range(max_depth + 1):
+            prefix = codes >> np.uint64(3 * (max_depth - level))
+            start = np.flatnonzero(np.concatenate(([True], prefix[1:] != prefix[:-1])))
+            end = np.append(start[1:], len(codes))
+            mass = np.add.reduceat(self.masses, start)
+            # Massless cells get a center of 0 rather than a division by zero; they add nothing
+            center = np.add.reduceat(weighted, start) / np.where(mass > 0, mass, 1)[:, None]
+            self.start.append(start)
+            self.end.append(end)
+            self.mass.append(mass)
+            self.center.append(center)
+            self.count.append(end - start)
+            if self.count[-1].max() <= leaf_size:
+                break
+        self.depth = len(self.start) - 1
+        self.leaf_size = leaf_size
+
+    def accelerations(self, theta=DEFAULT_THETA, softening=0.0, group_size=GROUP_SIZE, chunk_size=TREE_CHUNK):
+        # Accelerations of all bodies, in their original order. Bodies are walked down the
+        # tree in groups of neighbours along the curve, which share one interaction list:
+        # a cell is taken whole when it is far enough from every body of the group.
+        count = len(self.positions)
+        groups = -(-count // group_size)
+        padding = groups * group_size - count
+        # The last group is padded with copies of the last body, whose results are dropped
+        targets = np.concatenate((self.positions, np.repeat(self.positions[-1:], padding, axis=0)))
+        targets = targets.reshape(groups, group_size, 3)
+        self._group_low = targets.min(axis=1)
+        self._group_high = targets.max(axis=1)
+        self._group_start = np.arange(groups) * group_size
+        self._group_end = np.minimum(self._group_start + group_size, count)
+
+        acceleration = np.zeros((groups, group_size, 3))
+        block = max(chunk_size // group_size, 1)
+        for first in range(0, groups, block):
+            group_ids = np.arange(first, min(first + block, groups))
+            self._walk(group_ids, targets, acceleration, theta, softening)
+
+        result = np.empty((count, 3))
+        result[self.order] = acceleration.reshape(-1, 3)[:count]
+        return result
+
+    def _walk(self, group_ids, targets, acceleration, theta, softening):
+        # (group, cell) pairs still to resolve, kept sorted by group
+        pair_group = group_ids
+        pair_node = np.zeros(len(group_ids), dtype=np.intp)
+        for level in range(self.depth + 1):
+            start = self.start[level][pair_node]
+            end = self.end[level][pair_node]
+            center = self.center[level][pair_node]
+            # Distance from the center of mass to the nearest point of the group's bounding box
+            gap = np.maximum(np.maximum(self._group_low[pair_group] - center, center - self._group_high[pair_group]), 0)
+            distance_squared = np.einsum('ij,ij->i', gap, gap)
+            # Cells holding bodies of the group itself are never taken whole
+            overlap = (start < self._group_end[pair_group]) & (end > self._group_start[pair_group])
+            cell_size = self.size / (1 << level)
+            accept = ~overlap & (cell_size * cell_size < theta * theta * distance_squared)
+            self._interact(acceleration, targets, pair_group[accept], self.mass[level][pair_node[accept]],
+                           center[accept], None, softening)
+
+            # Small cells, and anything left at the bottom, are summed body by body
+            if level == self.depth:
+                near = ~accept
+            else:
+                near = ~accept & (self.count[level][pair_node] <= self.leaf_size)
+            if near.any():
+                counts = end[near] - start[near]
+                bodies = np.repeat(start[near], counts) + _ranges(counts)
+                self._interact(acceleration, targets, np.repeat(pair_group[near], counts), self.masses[bodies],
+                               self.positions[bodies], bodies, softening)
+
+            opened = ~accept & ~near
+            if not opened.any():
+                break
+            # Replace every opened pair by one pair per child cell
+            next_start = self.start[level + 1]
+            first = np.searchsorted(next_start, start[opened])
+            counts = np.searchsorted(next_start, end[opened]) - first
+            pair_node = np.repeat(first, counts) + _ranges(counts)
+            pair_group = np.repeat(pair_group[opened], counts)
+
+    def _interact(self, acceleration, targets, pair_group, mass, source, bodies, softening):
+        # Adds the pull of each source (a cell or a body) on every body of its group.
+        # pair_group is sorted, so the sum per group is a reduceat over runs.
+        if not len(pair_group):
+            return
+        group_size = targets.shape[1]
+        step = max(INTERACTION_BLOCK // group_size, 1)
+        for first in range(0, len(pair_group), step):
+            groups = pair_group[first:first + step]
+            difference = source[first:first + step, None, :] - targets[groups]
+            distance = np.sqrt(np.einsum('ijk,ijk->ij', difference, difference) + softening * softening)
+            if bodies is not None:
+                # A body exerts no force on itself, nor on the padding copies of the last body
+                target = self._group_start[groups][:, None] + np.arange(group_size)
+                own = (bodies[first:first + step, None] == target) | (target >= len(self.positions))
+                distance[own] = np.inf
+            magnitude = Gravitation.gravitational_field_strength(mass[first:first + step, None], distance) / distance
+            difference *= magnitude[:, :, None]
+            runs = np.flatnonzero(np.concatenate(([True], groups[1:] != groups[:-1])))
+            acceleration[groups[runs]] += np.add.reduceat(difference, runs, axis=0)
+
+
+def _ranges(counts):
+    # 0 .. n - 1 for every n in counts, concatenated
+    return np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+
+
+def barnes_hut_accelerations(positions, masses, theta=DEFAULT_THETA, softening=0.0):
+    return Octree(positions, masses).accelerations(theta, softening)
+
+
+class Simulation:
+    def __init__(self, positions, velocities, masses, softening=0.0, theta=DEFAULT_THETA, method='auto'):
+        self.positions = np.array(positions, dtype=np.float64)
+        self.velocities = np.array(velocities, dtype=np.float64)
+        self.masses = np.array(masses, dtype=np.float64)
+        self.softening = softening
+        self.theta = theta
+        # 'direct', 'barnes_hut', or 'auto' to pick by body count
+        self.method = method
+        self.time = 0.0
+        self.body_steps = 0
+        self.elapsed = 0.0
+        self.acceleration = self.accelerations()
+
+    def accelerations(self):
+        method = self.method
+        if method == 'auto':
+            method = 'direct' if len(self.positions) <= DIRECT_THRESHOLD else 'barnes_hut'
+        if method == 'direct':
+            return direct_accelerations(self.positions, self.masses, self.softening)
+        if method == 'barnes_hut':
+            return barnes_hut_accelerations(self.positions, self.masses, self.theta, self.softening)
+        raise ValueError(f"Unknown method: {self.method}")
+
+    def step(self, dt, steps=1):
+        # Leapfrog, kick-drift-kick: second order and symplectic, so energy errors stay bounded
+        start = time.perf_counter()
+        for _ in range(steps):
+            self.velocities += self.acceleration * (dt / 2)
+            self.positions += self.velocities * dt
+            self.acceleration = self.accelerations()
+            self.velocities += self.acceleration * (dt / 2)
+            self.time += dt
+        self.elapsed += time.perf_counter() - start
+        self.body_steps += steps * len(self.positions)
+
+    def body_steps_per_second(self):
+        return self.body_steps / self.elapsed if self.elapsed else 0.0
+
+    def kinetic_energy(self):
+        return 0.5 * np.sum(self.masses * np.einsum('ij,ij->i', self.velocities, self.velocities))
+
+    def potential_energy(self, chunk_size=DIRECT_CHUNK):
+        total = 0.0
+        for start in range(0, len(self.positions), chunk_size):
+            stop = min(start + chunk_size, len(self.positions))
+            difference = self.positions[None, :, :] - self.positions[start:stop, None, :]
+            distance = np.sqrt(np.einsum('ijk,ijk->ij', difference, difference) + self.softening ** 2)
+            # Each pair once
+            distance[np.arange(len(self.positions))[None, :] <= np.arange(start, stop)[:, None]] = np.inf
+            total += Gravitation.gravitational_potential_energy(self.masses[start:stop, None],
+                                                                self.masses[None, :], distance).sum()
+        return total
+
+    def energy(self):
+        return self.kinetic_energy() + self.potential_energy()
+
+
+def plummer_sphere(count, total_mass=1.0, radius=1.0, seed=0):
+    # Positions and velocities of a Plummer model in virial equilibrium, handy as a test load
+    rng = np.random.default_rng(seed)
+    r = radius / np.sqrt(rng.uniform(1e-6, 1, count) ** (-2 / 3) - 1)
+    direction = rng.normal(size=(count, 3))
+    positions = r[:, None] * direction / np.linalg.norm(direction, axis=1)[:, None]
+    escape = np.sqrt(2 * G * total_mass / np.sqrt(r * r + radius * radius))
+    # Von Neumann rejection sampling of q = v / v_escape from q^2 (1 - q^2)^(7/2)
+    q = np.empty(count)
+    pending = np.arange(count)
+    while len(pending):
+        candidate = rng.uniform(0, 1, len(pending))
+        accepted = rng.uniform(0, 0.1, len(pending)) < candidate ** 2 * (1 - candidate ** 2) ** 3.5
+        q[pending[accepted]] = candidate[accepted]
+        pending = pending[~accepted]
+    direction = rng.normal(size=(count, 3))
+    velocities = (q * escape)[:, None] * direction / np.linalg.norm(direction, axis=1)[:, None]
+    return positions, velocities, np.full(count, total_mass / count)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run an N-body simulation of a Plummer sphere and report throughput.")
+    parser.add_argument('-n', '--bodies', type=int, default=20000)
+    parser.add_argument('-s', '--steps', type=int, default=5)
+    parser.add_argument('--dt', type=float, default=0.01)
+    parser.add_argument('--theta', type=float, default=DEFAULT_THETA, help="Barnes-Hut opening angle")
+    parser.add_argument('--softening', type=float, default=0.01)
+    parser.add_argument('-m', '--method', choices=('auto', 'direct', 'barnes_hut'), default='auto')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    positions, velocities, masses = plummer_sphere(args.bodies, total_mass=1 / G, seed=args.seed)
+    simulation = Simulation(positions, velocities, masses, args.softening, args.theta, args.method)
+    simulation.step(args.dt, args.steps)
+    print(f"{args.bodies} bodies, {args.steps} steps: {simulation.body_steps_per_second():,.0f} body-steps/s")
+
+
+if __name__ == "__main__":
+    main()